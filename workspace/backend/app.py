@@ -10,7 +10,8 @@ from flask_migrate import Migrate
 from application.auth.v1.models import Permission, Role, User
 # for delegated auth:
 from application.auth.v2.models import DelegatedUser
-from application.models import Post, PostFactory
+from application.models import Post
+from application.page_cache import page_cache
 from application.models import Follow
 
 app = create_app(os.getenv('FLASK_CONFIG') or 'default')
@@ -25,6 +26,9 @@ if os.environ.get('FLASK_COVERAGE'):
 
 @app.shell_context_processor
 def make_shell_context():
+    # fake data generators are for development only:
+    from application.factories import PostFactory
+
     # make extra variables available in flask shell context:    
     return dict(
         # database connector:
@@ -75,6 +79,7 @@ def init_db_v1():
     """ Pop DB with initial data for local auth service
     """
     import json
+    from application.factories import PostFactory
     
     # init db:
     db.drop_all()
@@ -122,33 +127,163 @@ def init_db_v1():
     print("[Init Posts]: {} in total".format(post_count))
 
 @app.cli.command()
-def init_db_v2():
+@click.option('--top', default=20, help='Number of modules and packages to report.')
+def startup_profile(top):
+    """ Report import time per module of a fresh worker
+    """
+    import subprocess
+    from collections import defaultdict
+
+    # import app in a fresh interpreter, as a worker does on boot:
+    result = subprocess.run(
+        [
+            sys.executable, '-X', 'importtime', '-c', 
+            'import time; start = time.perf_counter(); import app; print(time.perf_counter() - start)'
+        ],
+        cwd = os.path.dirname(os.path.abspath(__file__)),
+        stdout = subprocess.PIPE,
+        stderr = subprocess.PIPE,
+        universal_newlines = True
+    )
+    if result.returncode != 0:
+        print(result.stderr)
+        sys.exit(result.returncode)
+
+    # format: import time: self [us] | cumulative | imported package
+    modules = []
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and not line.endswith('imported package'):
+            self_time, cumulative_time, name = line[len('import time:'):].split('|')
+            modules.append((int(self_time), int(cumulative_time), name.strip()))
+
+    packages = defaultdict(int)
+    for (self_time, _, name) in modules:
+        packages[name.split('.')[0]] += self_time
+
+    print("\t[Startup Profile]: app imported in {:.3f}s, {} modules".format(float(result.stdout.split()[-1]), len(modules)))
+    print("\t[Startup Profile]: slowest modules, self / cumulative [ms]:")
+    for (self_time, cumulative_time, name) in sorted(modules, reverse=True)[:top]:
+        print("\t\t{:8.1f} {:8.1f}  {}".format(self_time / 1000, cumulative_time / 1000, name))
+    print("\t[Startup Profile]: slowest packages, self [ms]:")
+    for (name, self_time) in sorted(packages.items(), key=lambda package: package[1], reverse=True)[:top]:
+        print("\t\t{:8.1f}  {}".format(self_time / 1000, name))
+
+@app.cli.command()
+@click.option('--url', default='http://127.0.0.1:8000/api/v2/posts/', help='Endpoint to load.')
+@click.option('--concurrency', default=32, help='Number of concurrent keep-alive clients.')
+@click.option('--duration', default=30, help='Load duration in seconds.')
+@click.option('--warmup', default=5, help='Unmeasured warmup in seconds.')
+def benchmark_serving(url, concurrency, duration, warmup):
+    """ Measure requests/sec and latency of a running server, e.g. gunicorn -c gunicorn.conf.py
+    """
+    import time
+    import requests
+    from concurrent.futures import ThreadPoolExecutor
+
+    def client(start, deadline):
+        session = requests.Session()
+        latencies, errors = [], 0
+        while True:
+            requested_at = time.perf_counter()
+            if requested_at >= deadline:
+                break
+            try:
+                ok = session.get(url, timeout=30).ok
+            except requests.RequestException:
+                ok = False
+            # skip warmup:
+            if requested_at >= start:
+                latencies.append(time.perf_counter() - requested_at)
+                errors += int(not ok)
+        session.close()
+
+        return latencies, errors
+
+    start = time.perf_counter() + warmup
+    deadline = start + duration
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda _: client(start, deadline), range(concurrency)))
+
+    latencies = sorted(latency for (client_latencies, _) in results for latency in client_latencies)
+    errors = sum(client_errors for (_, client_errors) in results)
+    if not latencies:
+        print("\t[Benchmark Serving]: no requests completed")
+        sys.exit(1)
+
+    def percentile(p):
+        return 1000 * latencies[min(int(p * len(latencies)), len(latencies) - 1)]
+
+    print("\t[Benchmark Serving]: {} requests, {} errors in {}s, concurrency {}".format(len(latencies), errors, duration, concurrency))
+    print("\t[Benchmark Serving]: {:.1f} requests/sec".format(len(latencies) / duration))
+    print("\t[Benchmark Serving]: latency p50 {:.1f}ms, p95 {:.1f}ms, p99 {:.1f}ms".format(percentile(0.5), percentile(0.95), percentile(0.99)))
+
+@app.cli.command()
+def deploy():
+    """ Run deployment tasks -- apply pending schema migrations
+    """
+    from flask_migrate import stamp, upgrade
+    from sqlalchemy import func, select
+    from application.deploy import BASELINE_REVISION, is_legacy, has_pending_migrations
+
+    # one deployment at a time:
+    lock_id = 5105
+    lock = db.engine.connect()
+    lock.execute(select([func.pg_advisory_lock(lock_id)]))
+    try:
+        with db.engine.connect() as connection:
+            legacy = is_legacy(connection)
+        if legacy:
+            print("\t[Deploy]: stamp schema created without migrations as {}".format(BASELINE_REVISION))
+            stamp(revision=BASELINE_REVISION)
+
+        with db.engine.connect() as connection:
+            pending = has_pending_migrations(connection)
+        if pending:
+            upgrade()
+            print("\t[Deploy]: schema upgraded")
+        else:
+            print("\t[Deploy]: schema up to date")
+    finally:
+        lock.execute(select([func.pg_advisory_unlock(lock_id)]))
+        lock.close()
+
+@app.cli.command()
+@click.option('--posts', 'num_posts', default=120, help='Posts to generate.')
+@click.option(
+    '--follows-per-user', default=None, type=int, 
+    help='Users followed by each user, defaults to half of the users.'
+)
+@click.option('--batch-size', default=10000, help='Rows per COPY batch.')
+@click.option('--render/--no-render', default=True, help='Render contents_html of generated posts.')
+@click.pass_context
+def init_db_v2(ctx, num_posts, follows_per_user, batch_size, render):
     """ Pop DB with initial data for delegated auth service
     """
-    import json
+    import random
+    from datetime import datetime, timedelta
+    from uuid import uuid4
+    from application.bulk import batched, copy_rows
+    from application.factories import fake
+    from application.timeline import timeline
     
+    from flask_migrate import stamp
+
     # init db:
     db.drop_all()
     db.create_all()
+    # the schema is created at the latest revision:
+    stamp()
     
     # sycn users from backend:
     from application.auth.v2.services import Users
+    from application.users.profiles import ProfileCache
     service_user_management = Users()
-    users = service_user_management.get()
+    users, _ = service_user_management.get_all()
 
     # add users:
     success = False
     try:
-        for user in users:
-            # init user:
-            _, id = user['user_id'].split('|')
-            user = DelegatedUser(
-                id = id,
-                email = user['email'],
-                nickname = user['nickname']
-            )
-            # add to transaction:
-            db.session.add(user)
+        ProfileCache.store_many(users)
         db.session.commit()
         success = True
     except:
@@ -160,46 +295,312 @@ def init_db_v2():
     user_count = DelegatedUser.query.count()   
     print("\t[Init Users]: {} in total".format(user_count)) 
 
-    # add posts:
-    while Post.query.count() < 120:
-        # in case the Faker creates a duplicated post:
+    # authors are loaded once, rows are generated in memory and loaded in batches:
+    author_ids = [id for (id, ) in DelegatedUser.query.with_entities(DelegatedUser.id)]
+    if not author_ids:
+        return
+
+    def load(table, columns, rows):
+        count = 0
+        connection = db.engine.connect()
         try:
-            # random author selection:
-            author = DelegatedUser.query.offset(
-                randint(0, user_count - 1)
-            ).first()
-            # create post:
-            post = PostFactory(author_id = author.id)
-            db.session.add(post)
-            db.session.commit()
-        except:
-            db.session.rollback()
-    db.session.close()
+            for batch in batched(rows, batch_size):
+                with connection.begin():
+                    count += copy_rows(connection, table, columns, batch)
+                print("\t\t[{}]: {} loaded".format(table, count))
+        finally:
+            connection.close()
+
+    # add posts:
+    start = datetime(2018, 1, 1)
+    span = (datetime.utcnow() - start).total_seconds()
+    posts = (
+        (
+            uuid4(), 
+            fake.sentence(nb_words=4), 
+            fake.text(), 
+            start + timedelta(seconds=random.uniform(0, span)),
+            random.choice(author_ids)
+        ) for _ in range(num_posts)
+    )
+    load('posts', ('uuid', 'title', 'contents', 'timestamp', 'author_id'), posts)
     # get post summary:
     post_count = Post.query.count()   
     print("\t[Init Posts]: {} in total".format(post_count)) 
 
     # add follows:
-    num_follows_per_user = user_count // 2 + 1
-    for follower in DelegatedUser.query.all():
-        for _ in range(num_follows_per_user):
-            try:
-                # generate followed:
-                followed = DelegatedUser.query.offset(
-                    randint(0, user_count - 1)
-                ).first()
-                
-                # disable self following:
-                if (follower.id != followed.id) and (not follower.is_following(followed)):
-                    follower.follow(followed)
-                    db.session.commit()
-            except:
-                db.session.rollback()
-    db.session.close()
-    # get post summary:
+    if follows_per_user is None:
+        follows_per_user = user_count // 2 + 1
+
+    def sample_followed(follower_id):
+        # disable self following:
+        candidates = random.sample(author_ids, min(follows_per_user + 1, user_count))
+        return [id for id in candidates if id != follower_id][:follows_per_user]
+
+    now = datetime.utcnow()
+    follows = (
+        (follower_id, followed_id, now)
+        for follower_id in author_ids
+        for followed_id in sample_followed(follower_id)
+    )
+    load('follows', ('follower_id', 'followed_id', 'timestamp'), follows)
+    # get follow summary:
     follows_count = Follow.query.count()   
     print("\t[Init Follows]: {} in total".format(follows_count)) 
 
+    # COPY bypasses counter, fan-out and listing version maintenance:
+    DelegatedUser.recount_counters()
+    timeline.rebuild()
+    Post.mark_listing_changed()
+    db.session.commit()
+    # and page cache invalidation:
+    page_cache.bump()
+
+    # render generated posts in parallel:
+    if render:
+        ctx.invoke(rerender_posts)
+
+@app.cli.command()
+@click.option('--batch-size', default=500, help='Posts per batch.')
+@click.option('--workers', default=None, type=int, help='Render processes, defaults to CPU count.')
+@click.option(
+    '--all', 'rerender_all', is_flag=True, 
+    help='Re-render all posts instead of those rendered by older renderers.'
+)
+@click.option(
+    '--checkpoint', default=None, type=click.Path(),
+    help='File to resume from and record progress in.'
+)
+def rerender_posts(batch_size, workers, rerender_all, checkpoint):
+    """ Re-render contents_html of posts in parallel
+    """
+    import time
+    from concurrent.futures import ProcessPoolExecutor
+    from sqlalchemy import text
+    from application.bulk import stream_batches, update_from_values, Checkpoint
+    from application.rendering import render, RENDER_VERSION
+
+    checkpoint = Checkpoint(checkpoint)
+    last_id = checkpoint.load() or 0
+    if last_id:
+        print("\t[Rerender Posts]: resume after id={}".format(last_id))
+
+    # read through a server-side cursor, write and checkpoint each batch on another connection:
+    reader = db.engine.connect()
+    writer = db.engine.connect()
+
+    count, start = 0, time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            batches = stream_batches(
+                reader,
+                text(
+                    """
+                    SELECT id, contents, md5(contents) FROM posts
+                    WHERE id > :last_id
+                      AND (:rerender_all OR contents_html IS NULL OR render_version IS DISTINCT FROM :render_version)
+                    ORDER BY id
+                    """
+                ),
+                batch_size,
+                last_id = last_id, 
+                rerender_all = rerender_all,
+                render_version = RENDER_VERSION
+            )
+            for batch in batches:
+                htmls = executor.map(
+                    render, 
+                    [contents for (_, contents, _) in batch],
+                    chunksize = max(len(batch) // ((workers or os.cpu_count()) * 4), 1)
+                )
+
+                with writer.begin():
+                    # skip posts edited meanwhile:
+                    update_from_values(
+                        writer,
+                        """
+                        UPDATE posts AS p
+                        SET contents_html = v.contents_html,
+                            render_version = v.render_version,
+                            rendered_at = now()
+                        FROM (VALUES %s) AS v (id, contents_html, render_version, contents_md5)
+                        WHERE p.id = v.id AND md5(p.contents) = v.contents_md5
+                        """,
+                        [
+                            (id, html, RENDER_VERSION, contents_md5) 
+                            for ((id, _, contents_md5), html) in zip(batch, htmls)
+                        ]
+                    )
+                checkpoint.save(batch[-1][0])
+
+                count += len(batch)
+                elapsed = time.perf_counter() - start
+                print("\t[Rerender Posts]: {} rows, {:.1f} rows/sec".format(count, count / elapsed))
+    finally:
+        reader.close()
+        writer.close()
+
+    checkpoint.clear()
+    print("\t[Rerender Posts]: {} in total".format(count))
+
+@app.cli.command()
+@click.option('--full', is_flag=True, help='List all users instead of those changed since last sync.')
+@click.option('--batch-size', default=1000, help='Users per upsert statement.')
+def sync_users(full, batch_size):
+    """ Upsert Auth0 users changed since last sync into delegated_users
+    """
+    import time
+    from datetime import timedelta
+    from application.auth.v2.services import Users
+    from application.models import SyncWatermark
+    from application.users.profiles import ProfileCache
+
+    start = time.perf_counter()
+    fetched, upserted = ProfileCache.sync(
+        Users(),
+        overlap = timedelta(seconds=app.config['AUTH0_SYNC_OVERLAP']),
+        full = full,
+        batch_size = batch_size
+    )
+    # upserted nicknames may be listed on cached pages:
+    if upserted:
+        page_cache.bump()
+
+    print("\t[Sync Users]: {} users fetched, {} upserted in {:.2f}s".format(fetched, upserted, time.perf_counter() - start))
+    print("\t[Sync Users]: synced up to {}".format(SyncWatermark.get(ProfileCache.SYNC_WATERMARK)))
+
+@app.cli.command()
+def recount_counters():
+    """ Repair follower, followed and post counters of all users
+    """
+    count = DelegatedUser.recount_counters()
+    db.session.commit()
+
+    print("\t[Recount Counters]: {} users repaired".format(count))
+
+@app.cli.command()
+@click.option('--batch-size', default=1000, help='Sessions per delete statement.')
+def sweep_sessions(batch_size):
+    """ Delete expired server-side sessions
+    """
+    from application.server_session import server_sessions
+
+    count = server_sessions.sweep(batch_size)
+
+    print("\t[Sweep Sessions]: {} expired sessions deleted".format(count))
+
+@app.cli.command()
+@click.option(
+    '--analyze/--no-analyze', default=True,
+    help='Execute the queries to report actual row counts and timings.'
+)
+def explain_hot_queries(analyze):
+    """ Print query plans of hot queries
+    """
+    from sqlalchemy import func, tuple_
+    from application.models import TimelineEntry
+    from application.utils import Explain
+
+    # sample parameters:
+    post = Post.query.order_by(Post.id.desc()).first()
+    if post is None:
+        print("[Explain]: no posts. Populate DB first.")
+        return
+    author_id = post.author_id
+    per_page = app.config['POSTS_PER_PAGE']
+
+    # post listings:
+    user_subq = DelegatedUser.query.with_entities(
+        DelegatedUser.id,
+        DelegatedUser.nickname
+    ).subquery()
+    listing = Post.query.with_entities(
+        Post.id,
+        Post.uuid,
+        Post.title,
+        user_subq.c.nickname.label('author'),
+        Post.timestamp
+    ).join(
+        user_subq, Post.author_id == user_subq.c.id
+    )
+    cursor = listing.order_by(
+        Post.timestamp.desc(), Post.id.desc()
+    ).offset(per_page - 1).first() or post
+
+    queries = [
+        (
+            'GET /posts/?page=1 -- items',
+            listing.order_by(
+                Post.timestamp.desc()
+            ).limit(per_page).offset(0)
+        ),
+        (
+            'GET /posts/?page=1 -- count',
+            db.session.query(func.count()).select_from(
+                listing.subquery()
+            )
+        ),
+        (
+            'GET /posts/?after=<cursor>',
+            listing.filter(
+                tuple_(Post.timestamp, Post.id) < tuple_(cursor.timestamp, cursor.id)
+            ).order_by(
+                Post.timestamp.desc(), Post.id.desc()
+            ).limit(per_page + 1)
+        ),
+        (
+            'GET /posts/<uuid>',
+            Post.query.with_entities(
+                Post.uuid,
+                Post.title,
+                user_subq.c.nickname.label("author"),
+                Post.timestamp,
+                Post.contents,
+                Post.contents_html
+            ).filter(
+                Post.uuid == post.uuid
+            ).join(
+                user_subq, Post.author_id == user_subq.c.id
+            ).limit(1)
+        ),
+        (
+            'GET /users/<id> -- latest posts',
+            Post.query.with_entities(
+                Post.uuid,
+                Post.title,
+                Post.timestamp
+            ).filter(
+                Post.author_id == author_id
+            ).order_by(
+                Post.timestamp.desc()
+            ).limit(10)
+        ),
+        (
+            'GET /users/<id> -- profile with counters',
+            DelegatedUser.query.filter(
+                DelegatedUser.id == author_id
+            ).limit(1)
+        ),
+        (
+            'GET /posts/feed -- materialized timeline',
+            db.session.query(
+                TimelineEntry.timestamp,
+                TimelineEntry.post_id
+            ).filter(
+                TimelineEntry.user_id == author_id
+            ).order_by(
+                TimelineEntry.timestamp.desc(),
+                TimelineEntry.post_id.desc()
+            ).limit(per_page + 1)
+        ),
+    ]
+
+    for (name, query) in queries:
+        print(f"[{name}]")
+        for (line, ) in db.session.execute(Explain(query, analyze=analyze)):
+            print(f"\t{line}")
+    db.session.rollback()
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=80, debug=True)
 
@@ -97,10 +97,33 @@ def create_app(config_name):
 
     # enable SQLAlchemy:
     db.init_app(app)
+    # enable server-side sessions:
+    from .server_session import server_sessions
+    server_sessions.init_app(app)
+    # flask-login only acts on its remember flag, set along with loading the session:
+    server_sessions.skip_unloaded(app, login_manager._update_remember_cookie)
     # enable moment:
     moment.init_app(app)
     # enable markdown editor:
     pagedown.init_app(app)
+    # enable Auth0 key set caches:
+    from .auth.v2.jwks import jwks_caches
+    jwks_caches.init_app(app)
+    # enable markdown rendering:
+    from .rendering import renderer
+    renderer.init_app(app)
+    # enable home timelines:
+    from .timeline import timeline
+    timeline.init_app(app)
+    # enable rendered page cache:
+    from .page_cache import page_cache
+    page_cache.init_app(app)
+    # enable post detail cache:
+    from .post_cache import post_cache
+    post_cache.init_app(app)
+    # enable followed ids cache:
+    from .follow_cache import followed_cache
+    followed_cache.init_app(app)
 
     # jinja:
     app.jinja_env.filters['datetime'] = format_datetime
@@ -11,7 +11,15 @@ api = Api(bp,
     description='API doc for Uda Social Blogging, version 1.0'
 )
 
+from .auth.tokens import token_cache
+
+@bp.record_once
+def init_token_cache(state):
+    token_cache.init_app(state.app)
+
 from .posts import ns as ns_posts
 api.add_namespace(ns_posts)
+from .feed import ns as ns_feed
+api.add_namespace(ns_feed)
 
 from . import errors
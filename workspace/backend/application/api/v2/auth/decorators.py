@@ -1,12 +1,11 @@
-from jose import jwt
-from urllib.request import urlopen
-import json
-
 from flask import current_app as app
 from flask import request, abort
 
 from functools import wraps
 
+from application.auth.v2.jwks import get_jwks_cache
+from .tokens import token_cache
+
 
 class AuthError(Exception):
     """ exception for Auth0 JWT verification
@@ -71,9 +70,8 @@ def get_token():
 def verify_decode_token(token):
     """ verify and decode JWT for Auth0
     """
-    # load public keys:
-    jsonurl = urlopen(f'{app.config["AUTH0_DOMAIN_URL"]}.well-known/jwks.json')
-    jwks = json.loads(jsonurl.read())
+    # jose loads all of its crypto backends, so it is imported on first verification only:
+    from jose import jwt
 
     # extract JWT header:
     unverified_header = jwt.get_unverified_header(token)
@@ -86,17 +84,10 @@ def verify_decode_token(token):
             401
         )
 
-    # select the public key declared in JWT:
-    rsa_key = None
-    for key in jwks['keys']:
-        if key['kid'] == unverified_header['kid']:
-            rsa_key = {
-                'kty': key['kty'],
-                'kid': key['kid'],
-                'use': key['use'],
-                'n': key['n'],
-                'e': key['e']
-            }
+    # select the public key declared in JWT from cached key set:
+    rsa_key = get_jwks_cache(
+        app.config["AUTH0_DOMAIN_URL"]
+    ).get_key(unverified_header['kid'])
 
     # if matching key is selected:
     if not (rsa_key is None):
@@ -179,8 +170,11 @@ def requires_auth(permissions = None):
             try:
                 # get JWT token:
                 token = get_token()
-                # authentication:
-                payload = verify_decode_token(token)
+                # authentication, skipped for tokens verified before:
+                payload = token_cache.get(token)
+                if payload is None:
+                    payload = verify_decode_token(token)
+                    token_cache.set(token, payload)
                 # authorization:
                 if not (permissions is None):
                     check_permission(payload, permissions)
@@ -0,0 +1,54 @@
+import hashlib
+
+from application.cache import LRUCache
+
+
+class VerifiedTokenCache:
+    """ payloads of already verified JWTs
+        - keyed by SHA-256 digest of the raw token, so tokens are never kept in memory
+        - each payload expires exactly when its token does
+    """
+    def __init__(self, capacity=1024):
+        self._payloads = LRUCache(capacity)
+
+    def init_app(self, app):
+        """ integrate with app factory
+        """
+        self._payloads.capacity = app.config['AUTH0_TOKEN_CACHE_SIZE']
+        self._payloads.clear()
+
+    @staticmethod
+    def digest(token):
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    def get(self, token):
+        """ verified payload of given token, None if it has to be verified
+        """
+        return self._payloads.get(
+            VerifiedTokenCache.digest(token)
+        )
+
+    def set(self, token, payload):
+        """ remember verified payload until the token expires
+        """
+        # tokens without expiry are always verified:
+        if not ('exp' in payload):
+            return
+
+        self._payloads.set(
+            VerifiedTokenCache.digest(token),
+            payload,
+            expires_at = payload['exp']
+        )
+
+    def clear(self):
+        self._payloads.clear()
+
+    @property
+    def stats(self):
+        """ hit / miss counters
+        """
+        return self._payloads.stats
+
+# shared by all threads of the worker:
+token_cache = VerifiedTokenCache()
@@ -0,0 +1,52 @@
+from application.timeline import timeline
+
+from flask import current_app
+from flask import abort, request
+
+from flask_restplus import Namespace, Resource
+
+from .auth.decorators import requires_auth
+from .posts import post_brief
+
+# create namespace
+ns = Namespace('feed', description='Posts of followed users')
+
+# create header schema: 
+parser = ns.parser()
+parser.add_argument('Authorization', location='headers', help="Bearer [YOUR_JWT]")
+
+@ns.route('/')
+@ns.expect(parser)
+class Feed(Resource):
+    ''' home timeline
+        - GET posts of followed users, newest first
+    '''
+    @ns.doc(
+        'get_feed', 
+        params={'after': 'Cursor from X-Next-Cursor header, empty for the first page'}
+    )
+    @ns.marshal_list_with(post_brief)
+    @ns.response(400, 'Bad Authorization Header. Invalid cursor')
+    @ns.response(401, 'Unauthorized')
+    @requires_auth()
+    def get(userinfo, self):
+        '''List posts of followed users
+        '''
+        # extract current user id:
+        _, user_id = userinfo['sub'].split('|')
+
+        try:
+            posts, next_cursor = timeline.read(
+                user_id,
+                after=request.args.get('after', ''),
+                per_page=current_app.config['POSTS_PER_PAGE']
+            )
+        except ValueError as e:
+            abort(400, description=str(e))
+
+        headers = {}
+        if not (next_cursor is None):
+            headers['X-Next-Cursor'] = next_cursor
+            headers['Link'] = f'<{request.base_url}?after={next_cursor}>; rel="next"'
+
+        return posts, 200, headers
@@ -4,7 +4,11 @@ import uuid
 from application import db
 
 from application.auth.v2.models import DelegatedUser
+from application.http_cache import conditional, make_etag, validate
 from application.models import Post
+from application.pagination import KeysetPagination
+from application.post_cache import post_cache
+from application.timeline import timeline
 
 from flask import current_app
 from flask import abort, request
@@ -64,14 +68,24 @@ class PostList(Resource):
     '''
     @ns.doc(
         'list_posts', 
-        params={'page': 'Page number for pagination'}
+        params={
+            'page': 'Page number for pagination',
+            'after': 'Cursor from X-Next-Cursor header for keyset pagination, empty for the first page'
+        }
     )
+    @conditional
     @ns.marshal_list_with(post_brief)
+    @ns.response(304, 'Not modified')
+    @ns.response(400, 'Invalid cursor')
     def get(self):
         '''List all posts
         '''
-        # parse query parameter page:
-        page = request.args.get('page', 1, type=int)
+        # validators, the page is identified by its cursor or number:
+        cursor = ('after', request.args['after']) if ('after' in request.args) else \
+            ('page', request.args.get('page', 1, type=int))
+        headers = validate(
+            make_etag(Post.listing_version(), *cursor, current_app.config['POSTS_PER_PAGE'])
+        )
 
         # data:
         user_subq = DelegatedUser.query.with_entities(
@@ -79,33 +93,55 @@ class PostList(Resource):
             DelegatedUser.nickname
         ).subquery()
 
-        # generate pagination:
-        pagination = Post.query.with_entities(
+        query = Post.query.with_entities(
+            Post.id,
             Post.uuid,
             Post.title,
             user_subq.c.nickname.label('author'),
             Post.timestamp
         ).join(
             user_subq, Post.author_id == user_subq.c.id
-        ).order_by(
-            Post.timestamp.desc()
-        ).paginate(
-            page, per_page=current_app.config['POSTS_PER_PAGE'],
-            error_out=False
         )
+
+        # keyset pagination, opted in by query parameter after:
+        if 'after' in request.args:
+            try:
+                pagination = KeysetPagination(
+                    query, Post.timestamp, Post.id,
+                    after=request.args['after'],
+                    per_page=current_app.config['POSTS_PER_PAGE']
+                )
+            except ValueError as e:
+                abort(400, description=str(e))
+
+            if pagination.has_next:
+                headers['X-Next-Cursor'] = pagination.next_cursor
+                headers['Link'] = f'<{request.base_url}?after={pagination.next_cursor}>; rel="next"'
+        # offset pagination:
+        else:
+            # parse query parameter page:
+            page = request.args.get('page', 1, type=int)
+
+            # generate pagination:
+            pagination = query.order_by(
+                Post.timestamp.desc()
+            ).paginate(
+                page, per_page=current_app.config['POSTS_PER_PAGE'],
+                error_out=False
+            )
         posts = pagination.items
 
         # format:
         posts=[
             {
-                "id": id.hex,
-                "title": title,
-                "author": author,
-                "timestamp": timestamp,
-            } for (id, title, author, timestamp) in posts
+                "id": post.uuid.hex,
+                "title": post.title,
+                "author": post.author,
+                "timestamp": post.timestamp,
+            } for post in posts
         ]
 
-        return posts
+        return posts, 200, headers
     
     @ns.doc('create_post')
     @ns.expect(post_input)
@@ -124,33 +160,25 @@ class PostList(Resource):
 
         error = True
         try:
-            # create new post id:
-            if Post.query.count() == 0:
-                id = 1
-            else:
-                from sqlalchemy.sql import func
-                post_id_summary = db.session.query(
-                    func.max(Post.id).label("max")
-                ).one()
-                id = post_id_summary.max + 1
-
             # extract author id:
             _, author_id = userinfo['sub'].split('|')
 
-            # create new post:
+            # create new post, id is allocated by database:
             post = Post(
-                id = id,
                 title = post_new['title'],
                 contents = post_new['contents'],
                 author_id = author_id
             )
-            # insert:
+            # insert, INSERT ... RETURNING id:
             db.session.add(post)
-            # write
-            db.session.commit()
-            # prepare response:
+            db.session.flush()
+            # fan out to followers:
+            timeline.on_post_created(post)
+            # prepare response before commit expires the post:
             post_created = post.to_json()
             post_created['timestamp'] = datetime.strptime(post_created['timestamp'], "%Y-%m-%dT%H:%M:%S.%fZ")
+            # write
+            db.session.commit()
             # update flag:
             error = False
         except:
@@ -173,7 +201,9 @@ class PostInstance(Resource):
     ''' post instance
     '''
     @ns.doc('get_post')
+    @conditional
     @ns.marshal_with(post_detail)
+    @ns.response(304, 'Not modified')
     @ns.response(400, 'Bad Authorization Header. Permissions are missing')
     @ns.response(401, 'Unauthorized')
     @ns.response(403, 'Forbidden')
@@ -182,33 +212,32 @@ class PostInstance(Resource):
     def get(userinfo, self, id):
         '''Fetch a given post
         '''
-        # data:
-        post = Post.query.with_entities(
-            Post.uuid,
-            Post.title,
-            Post.contents,
-            Post.timestamp,
-            Post.author_id
-        ).filter(
-            Post.uuid == uuid.UUID(id)
-        ).first()
+        # cached post, else validators checked before the contents are loaded:
+        post = post_cache.cached(id)
+        version = post_cache.version(id) if (post is None) else post
 
-        if post is None:
+        if version is None:
             abort(
                 404, 
                 description='There is no post with id={}'.format(id)
             )
 
-        # format:
-        post = {
-            "id": post.uuid.hex,
-            "title": post.title,
-            "author_id": post.author_id,
-            "timestamp": post.timestamp,
-            "contents": post.contents
-        }
+        headers = validate(
+            make_etag(version['id'], version['timestamp']), 
+            last_modified = version['timestamp']
+        )
+
+        # data, read through post detail cache:
+        if post is None:
+            post = post_cache.get(id)
+
+        if post is None:
+            abort(
+                404, 
+                description='There is no post with id={}'.format(id)
+            )
 
-        return post
+        return post, 200, headers
 
     @ns.doc('update_post')
     @ns.expect(post_input)
@@ -249,9 +278,10 @@ class PostInstance(Resource):
                     description="You don't have the permission to modify"
                 )
 
-            # update:
+            # update, timestamp versions the post for http caching:
             post.title = post_updated["title"]
             post.contents = post_updated["contents"]
+            post.timestamp = datetime.utcnow()
             # insert:
             db.session.add(post)
             # write
@@ -3,9 +3,6 @@ from application import db
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin, AnonymousUserMixin
 
-import factory
-import factory.fuzzy
-
 import random
 from datetime import datetime
 
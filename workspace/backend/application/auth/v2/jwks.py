@@ -0,0 +1,193 @@
+import json
+import time
+import threading
+from urllib.request import urlopen
+
+
+def fetch_jwks(url, timeout):
+    """ download JSON Web Key Set from Auth0
+    """
+    with urlopen(url, timeout=timeout) as response:
+        return json.loads(response.read())
+
+#  JWKS cache
+#  ----------------------------------------------------------------
+class JWKSCache:
+    """ per-worker cache of Auth0 public keys
+        - keys are served from memory until ttl is reached
+        - after ttl - refresh_ahead, the key set is refreshed in background
+        - an unknown kid forces a refetch, at most once per min_refresh_interval
+        - a kid still unknown after refetch is negatively cached for negative_ttl
+        - while Auth0 is down, the previous key set is served and refetched at most once
+          per min_refresh_interval
+    """
+    # upper bound of negatively cached kids:
+    MAX_UNKNOWN_KIDS = 1024
+
+    def __init__(
+        self, url,
+        ttl=3600, refresh_ahead=300, min_refresh_interval=60, negative_ttl=300, timeout=5,
+        fetch=fetch_jwks
+    ):
+        self.url = url
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        self.min_refresh_interval = min_refresh_interval
+        self.negative_ttl = negative_ttl
+        self.timeout = timeout
+        self.fetch = fetch
+
+        # key set:
+        self._keys = {}
+        self._fetched_at = None
+        self._attempted_at = None
+        # kid -> expiry of negative entry:
+        self._unknown = {}
+        # only one fetch at a time:
+        self._lock = threading.Lock()
+        # at most one background refresh at a time:
+        self._refreshing = False
+        self._refreshing_lock = threading.Lock()
+
+    def get_key(self, kid):
+        """ get RSA key for given kid, None if Auth0 doesn't know it
+        """
+        now = time.monotonic()
+
+        # cold or expired key set, unless the last refetch failed just now:
+        if (self._fetched_at is None) or (now - self._fetched_at >= self.ttl):
+            if not self._failed_recently(now):
+                self.refresh(stale_if_error=True)
+        # about to expire:
+        elif (now - self._fetched_at >= self.ttl - self.refresh_ahead) and not self._failed_recently(now):
+            self._refresh_in_background()
+
+        rsa_key = self._keys.get(kid)
+        if not (rsa_key is None):
+            return rsa_key
+
+        # kid known to be bad:
+        expires_at = self._unknown.get(kid)
+        if (not (expires_at is None)) and (now < expires_at):
+            return None
+
+        # key rotation -- refetch, but don't let kid flooding hammer Auth0:
+        if (self._attempted_at is None) or (now - self._attempted_at >= self.min_refresh_interval):
+            self.refresh(stale_if_error=True)
+            rsa_key = self._keys.get(kid)
+
+        if rsa_key is None:
+            if len(self._unknown) >= JWKSCache.MAX_UNKNOWN_KIDS:
+                self._unknown.clear()
+            self._unknown[kid] = now + self.negative_ttl
+
+        return rsa_key
+
+    def refresh(self, stale_if_error=False):
+        """ fetch key set from Auth0
+        """
+        requested_at = time.monotonic()
+
+        with self._lock:
+            # another thread has just refreshed the key set:
+            if (not (self._fetched_at is None)) and (self._fetched_at >= requested_at):
+                return
+
+            # another thread has just failed, don't queue up behind the timeout once more:
+            if stale_if_error and self._keys and \
+                (not (self._attempted_at is None)) and (self._attempted_at >= requested_at):
+                return
+
+            self._attempted_at = time.monotonic()
+            try:
+                jwks = self.fetch(self.url, self.timeout)
+            except Exception:
+                # keep serving the previous key set when Auth0 is unreachable:
+                if stale_if_error and self._keys:
+                    return
+                raise
+
+            self._keys = {
+                key['kid']: {
+                    'kty': key['kty'],
+                    'kid': key['kid'],
+                    'use': key['use'],
+                    'n': key['n'],
+                    'e': key['e']
+                } for key in jwks['keys']
+            }
+            self._fetched_at = time.monotonic()
+            # new key set, forget previous misses:
+            self._unknown = {}
+
+    def _failed_recently(self, now):
+        """ whether the last fetch failed within min_refresh_interval and stale keys can be served
+        """
+        return bool(self._keys) and \
+            (not (self._attempted_at is None)) and (self._attempted_at > self._fetched_at) and \
+            (now - self._attempted_at < self.min_refresh_interval)
+
+    def _refresh_in_background(self):
+        """ refresh key set without blocking current request
+        """
+        with self._refreshing_lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def refresh():
+            try:
+                self.refresh(stale_if_error=True)
+            except Exception:
+                pass
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+#  registry
+#  ----------------------------------------------------------------
+class JWKSCaches:
+    """ one JWKS cache per Auth0 domain, shared by all token verifiers in this worker
+        - settings are taken from the app config on init_app
+    """
+    def __init__(self):
+        self.settings = {}
+
+        self._caches = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """ integrate with app factory
+        """
+        with self._lock:
+            self.settings = {
+                "ttl": app.config['AUTH0_JWKS_TTL'],
+                "refresh_ahead": app.config['AUTH0_JWKS_REFRESH_AHEAD'],
+                "min_refresh_interval": app.config['AUTH0_JWKS_MIN_REFRESH_INTERVAL'],
+                "negative_ttl": app.config['AUTH0_JWKS_NEGATIVE_TTL'],
+                "timeout": app.config['AUTH0_JWKS_TIMEOUT']
+            }
+            # caches built with previous settings:
+            self._caches = {}
+
+    def get(self, domain):
+        """ JWKS cache of given Auth0 domain
+        """
+        cache = self._caches.get(domain)
+
+        if cache is None:
+            with self._lock:
+                cache = self._caches.get(domain)
+                if cache is None:
+                    cache = JWKSCache(f'{domain}.well-known/jwks.json', **self.settings)
+                    self._caches[domain] = cache
+
+        return cache
+
+jwks_caches = JWKSCaches()
+
+def get_jwks_cache(domain):
+    """ JWKS cache shared by all token verifiers of the given Auth0 domain in this worker
+    """
+    return jwks_caches.get(domain)
@@ -1,8 +1,8 @@
 from application import db
-from application.models import Follow
-
-import factory
-import factory.fuzzy
+from application.follow_cache import followed_cache, follows_changed
+from application.models import Follow, Post
+from sqlalchemy import case, event, text
+from sqlalchemy.dialects.postgresql import insert
 
 import random
 from datetime import datetime
@@ -22,6 +22,17 @@ class DelegatedUser(db.Model):
     
     # profile info:
     nickname = db.Column(db.String(64), index=True)
+    # profile cache, synced from Auth0:
+    location = db.Column(db.String(64))
+    about_me = db.Column(db.Text)
+    profile_updated_at = db.Column(db.DateTime)
+    last_login = db.Column(db.DateTime)
+    profile_synced_at = db.Column(db.DateTime)
+
+    # counters, maintained on follow / unfollow and post insert / delete:
+    num_followers = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    num_followed = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    num_posts = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     # posts:
     posts = db.relationship('Post', backref='author', lazy=True)
@@ -55,31 +66,102 @@ class DelegatedUser(db.Model):
 
     def follow(self, user):
         """ let self follow user
+            - return whether a new follow was created
         """
-        if not self.is_following(user):
-            follow = Follow(
+        result = db.session.execute(
+            insert(Follow).values(
                 follower_id = self.id,
-                followed_id = user.id
+                followed_id = user.id,
+                timestamp = datetime.utcnow()
+            ).on_conflict_do_nothing(
+                constraint = 'uq_follows_follower_id_followed_id'
             )
-            db.session.add(follow)
+        )
+
+        created = result.rowcount > 0
+        if created:
+            self._count_follow(user, 1)
+
+        return created
     
     def unfollow(self, user):
         """ let self unfollow user
+            - return whether an existing follow was removed
         """
-        if self.is_following(user):
-            follow = self.followed.filter(
-                Follow.followed_id == user.id
-            ).first()
-            db.session.delete(follow)
-    
-    def is_following(self, user):
-        """ whether self follows user
-        """
-        follow = self.followed.filter(
+        count = Follow.query.filter(
+            Follow.follower_id == self.id,
             Follow.followed_id == user.id
-        ).first()
+        ).delete(synchronize_session=False)
 
-        return not follow is None
+        removed = count > 0
+        if removed:
+            self._count_follow(user, -1)
+
+        return removed
+
+    def _count_follow(self, user, delta):
+        """ update follow counters of self and user in one statement
+        """
+        users = DelegatedUser.__table__
+
+        db.session.execute(
+            users.update().where(
+                users.c.id.in_([self.id, user.id])
+            ).values(
+                num_followed = users.c.num_followed + case([(users.c.id == self.id, delta)], else_=0),
+                num_followers = users.c.num_followers + case([(users.c.id == user.id, delta)], else_=0)
+            )
+        )
+
+        # counters of loaded users are stale now:
+        db.session.expire(self, ['num_followed', 'num_followers'])
+        db.session.expire(user, ['num_followed', 'num_followers'])
+        # so are the cached follows of self:
+        follows_changed(self.id)
+
+    @staticmethod
+    def recount_counters():
+        """ repair drifted counters of all users from follows and posts
+            - return the number of repaired users
+        """
+        result = db.session.execute(
+            text(
+                """
+                UPDATE delegated_users AS u
+                SET num_followers = c.num_followers,
+                    num_followed = c.num_followed,
+                    num_posts = c.num_posts
+                FROM (
+                    SELECT
+                        u.id,
+                        COALESCE(followers.n, 0) AS num_followers,
+                        COALESCE(followed.n, 0) AS num_followed,
+                        COALESCE(posts.n, 0) AS num_posts
+                    FROM delegated_users AS u
+                    LEFT JOIN (
+                        SELECT followed_id AS id, COUNT(*) AS n FROM follows GROUP BY followed_id
+                    ) AS followers USING (id)
+                    LEFT JOIN (
+                        SELECT follower_id AS id, COUNT(*) AS n FROM follows GROUP BY follower_id
+                    ) AS followed USING (id)
+                    LEFT JOIN (
+                        SELECT author_id AS id, COUNT(*) AS n FROM posts GROUP BY author_id
+                    ) AS posts USING (id)
+                ) AS c
+                WHERE u.id = c.id
+                  AND (u.num_followers, u.num_followed, u.num_posts)
+                      IS DISTINCT FROM (c.num_followers, c.num_followed, c.num_posts)
+                """
+            )
+        )
+
+        return result.rowcount
+    
+    def is_following(self, user, since=None):
+        """ whether self follows user, looked up in the cached followed ids
+            - since, as unix timestamp, skips cached ids fetched before
+        """
+        return user.id in followed_cache.get(self.id, since)
     
     def is_followed_by(self, user):
         """ whether self is followed by user
@@ -89,3 +171,25 @@ class DelegatedUser(db.Model):
         ).first()
 
         return not follow is None
+
+#----------------------------------------------------------------------------#
+# post counter
+#----------------------------------------------------------------------------#
+def _count_post(connection, author_id, delta):
+    users = DelegatedUser.__table__
+
+    connection.execute(
+        users.update().where(
+            users.c.id == author_id
+        ).values(
+            num_posts = users.c.num_posts + delta
+        )
+    )
+
+@event.listens_for(Post, 'after_insert')
+def count_created_post(mapper, connection, post):
+    _count_post(connection, post.author_id, 1)
+
+@event.listens_for(Post, 'after_delete')
+def count_deleted_post(mapper, connection, post):
+    _count_post(connection, post.author_id, -1)
@@ -1,9 +1,13 @@
+import asyncio
 import json
-from jose import jwt
+import math
+import threading
+import time
 
 import requests
-from urllib.request import urlopen
 import urllib.parse
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from flask import current_app
 from flask import jsonify
@@ -13,6 +17,8 @@ from webargs.flaskparser import use_kwargs
 
 from config import config
 
+from .jwks import get_jwks_cache
+
 class AuthError(Exception):
     """ exception for Auth0 JWT verification
     """
@@ -23,10 +29,47 @@ class AuthError(Exception):
 #  Auth0 service
 #  ----------------------------------------------------------------
 class Provider:
-    def __init__(self, domain, token, algorithms):
+    """ Auth0 backend
+        - one keep-alive connection pool shared by all calls
+        - every call is bounded by connect / read timeouts
+        - idempotent calls are retried with backoff on connection errors, 429 and 5xx,
+          honoring Retry-After
+    """
+    # retried responses:
+    RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+    # user creation is not idempotent:
+    RETRY_METHODS = frozenset(['GET', 'PATCH', 'DELETE'])
+
+    def __init__(
+        self, domain, token, algorithms, 
+        pool_size=10, timeout=(3.05, 10), retries=3, backoff_factor=0.5
+    ):
         self.domain = domain
         self.token = token
         self.algorithms = algorithms
+        self.timeout = timeout
+
+        # keep-alive connection pool:
+        adapter = HTTPAdapter(
+            pool_connections = pool_size,
+            pool_maxsize = pool_size,
+            max_retries = Retry(
+                total = retries,
+                backoff_factor = backoff_factor,
+                status_forcelist = Provider.RETRY_STATUSES,
+                method_whitelist = Provider.RETRY_METHODS,
+                respect_retry_after_header = True,
+                # return the last response once retries are exhausted:
+                raise_on_status = False
+            )
+        )
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        # latency metrics:
+        self._metrics = {}
+        self._lock = threading.Lock()
 
     @property
     def jwks_url(self):
@@ -42,51 +85,90 @@ class Provider:
             'Content-Type': 'application/json'
         }
 
+    def request(self, method, url, **kwargs):
+        """ call backend, recording latency
+        """
+        start = time.perf_counter()
+        error = True
+        try:
+            response = self.session.request(
+                method,
+                url,
+                headers=self.headers,
+                timeout=self.timeout,
+                **kwargs
+            )
+            error = not response.ok
+
+            return response
+        finally:
+            self._record(method, time.perf_counter() - start, error)
+
+    def _record(self, method, latency, error):
+        with self._lock:
+            metrics = self._metrics.setdefault(
+                method, 
+                {'calls': 0, 'errors': 0, 'total_latency': 0.0, 'max_latency': 0.0}
+            )
+            metrics['calls'] += 1
+            metrics['errors'] += int(error)
+            metrics['total_latency'] += latency
+            metrics['max_latency'] = max(metrics['max_latency'], latency)
+
+    @property
+    def stats(self):
+        """ per-method call / error counters and latencies, in seconds
+        """
+        with self._lock:
+            return {
+                method: dict(
+                    metrics,
+                    avg_latency = metrics['total_latency'] / metrics['calls']
+                ) for (method, metrics) in self._metrics.items()
+            }
+
     def get(self, url, params={}):
         """ GET
         """
-        return requests.get(
+        return self.request(
+            'GET',
             url, 
-            headers=self.headers, 
             params=params
         )
 
     def post(self, url, data):
         """ POST
         """
-        return requests.post(
+        return self.request(
+            'POST',
             url, 
-            headers=self.headers, 
             json=data
         )
 
     def patch(self, url, data):
-        """ POST
+        """ PATCH
         """
-        return requests.patch(
+        return self.request(
+            'PATCH',
             url, 
-            headers=self.headers, 
             json=data
         )
 
     def delete(self, url, params={}):
         """ DELETE
         """
-        return requests.delete(
+        return self.request(
+            'DELETE',
             url, 
-            headers=self.headers, 
             params=params
         )
 
-    def decode_token(self, audience, token):
+    def decode_token(self, audience, token, access_token=None):
         """ verify and decode JWT for Auth0
+            - with access_token, also its at_hash claim, as for id tokens
         """
-        # load public keys:
-        jwks = json.loads(
-            urlopen(
-                self.jwks_url
-            )
-        )
+        # jose loads all of its crypto backends, so it is imported on first verification only:
+        from jose import jwt
 
         # extract JWT header:
         unverified_header = jwt.get_unverified_header(token)
@@ -99,17 +181,10 @@ class Provider:
                 401
             )
 
-        # select the public key declared in JWT:
-        rsa_key = None
-        for key in jwks['keys']:
-            if key['kid'] == unverified_header['kid']:
-                rsa_key = {
-                    'kty': key['kty'],
-                    'kid': key['kid'],
-                    'use': key['use'],
-                    'n': key['n'],
-                    'e': key['e']
-                }
+        # select the public key declared in JWT from cached key set:
+        rsa_key = get_jwks_cache(self.domain).get_key(
+            unverified_header['kid']
+        )
 
         # if matching key is selected:
         if not (rsa_key is None):
@@ -119,7 +194,8 @@ class Provider:
                     rsa_key,
                     algorithms=self.algorithms,
                     audience=audience,
-                    issuer=self.domain
+                    issuer=self.domain,
+                    access_token=access_token
                 )
 
                 return payload
@@ -157,15 +233,185 @@ class Provider:
             400
         )
 
+    def decode_id_token(self, client_id, token, nonce):
+        """ verify and decode the id token of an authorization code token response
+            - nonce: as stored in the session when the authorization request was started
+        """
+        from jose import jwt
+
+        # the authorization request wasn't started by this session:
+        if nonce is None:
+            raise AuthError(
+                {
+                    'code': 'invalid_claims',
+                    'description': 'Missing nonce.'
+                }, 
+                401
+            )
+
+        # at_hash is optional in code flow id tokens, but jose requires it once given
+        # the access token -- so check it only if present, like authlib does:
+        try:
+            has_at_hash = 'at_hash' in jwt.get_unverified_claims(token['id_token'])
+        except Exception:
+            # malformed, rejected by decode_token:
+            has_at_hash = False
+
+        claims = self.decode_token(
+            client_id, token['id_token'], access_token=token.get('access_token') if has_at_hash else None
+        )
+
+        # issued for the authorization request of this session:
+        if claims.get('nonce') != nonce:
+            raise AuthError(
+                {
+                    'code': 'invalid_claims',
+                    'description': 'Incorrect nonce.'
+                }, 
+                401
+            )
+
+        return claims
+
+class AsyncProvider:
+    """ asyncio Auth0 backend for concurrent bulk reads, e.g. user syncs
+        - at most concurrency calls are in flight
+        - 429 pauses all calls until Retry-After / X-RateLimit-Reset, as does
+          a response reporting an exhausted rate limit window
+        - calls are retried with backoff on connection errors, timeouts and 5xx
+    """
+    # retried responses, besides 429:
+    RETRY_STATUSES = frozenset([500, 502, 503, 504])
+    # Auth0 serves at most 1000 results through page / per_page:
+    MAX_PAGED_RESULTS = 1000
+
+    def __init__(
+        self, domain, token,
+        concurrency=4, timeout=(3.05, 10), retries=3, backoff_factor=0.5
+    ):
+        self.domain = domain
+        self.token = token
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+
+        # epoch time until which all calls wait for the rate limit to reset:
+        self._resume_at = 0.0
+
+    @property
+    def headers(self):
+        """ authorization header
+        """
+        return {
+            'Authorization': f'Bearer {self.token}',
+            'Accept': 'application/json'
+        }
+
+    def _pause(self, headers, status):
+        """ seconds to pause all calls after given response
+        """
+        if status == 429 and ('Retry-After' in headers):
+            delay = float(headers['Retry-After'])
+        elif (status == 429 or headers.get('X-RateLimit-Remaining') == '0') and ('X-RateLimit-Reset' in headers):
+            delay = float(headers['X-RateLimit-Reset']) - time.time()
+        else:
+            return 0.0
+
+        self._resume_at = max(self._resume_at, time.time() + delay)
+        return max(delay, 0.0)
+
+    async def _get_json(self, session, semaphore, url, params):
+        # aiohttp is only needed by bulk jobs, so it stays off the worker boot path:
+        import aiohttp
+
+        for attempt in range(self.retries + 1):
+            backoff = self.backoff_factor * (2 ** attempt)
+            async with semaphore:
+                # wait for rate limit window to reset:
+                delay = self._resume_at - time.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+                try:
+                    async with session.get(url, params=params, headers=self.headers) as response:
+                        pause = self._pause(response.headers, response.status)
+                        retriable = (response.status == 429) or (response.status in AsyncProvider.RETRY_STATUSES)
+                        if not retriable or attempt == self.retries:
+                            response.raise_for_status()
+                            return await response.json()
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                    if attempt == self.retries:
+                        raise
+                    pause = 0.0
+
+            await asyncio.sleep(max(pause, backoff))
+
+    async def get_pages(self, url, key, params={}, per_page=100):
+        """ all items of a paged listing, pages after the first are fetched concurrently
+            - return (items, total), total may exceed the MAX_PAGED_RESULTS items served
+        """
+        import aiohttp
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        async with aiohttp.ClientSession(
+            connector = aiohttp.TCPConnector(limit=self.concurrency),
+            timeout = aiohttp.ClientTimeout(
+                sock_connect = self.timeout[0],
+                sock_read = self.timeout[1]
+            )
+        ) as session:
+            def fetch(page):
+                return self._get_json(
+                    session, semaphore, url,
+                    dict(params, page=page, per_page=per_page, include_totals='true')
+                )
+
+            # first page reports the total:
+            first = await fetch(0)
+            total = first['total']
+            num_pages = math.ceil(min(total, AsyncProvider.MAX_PAGED_RESULTS) / per_page)
+            pages = await asyncio.gather(
+                *[fetch(page) for page in range(1, num_pages)]
+            )
+
+        items = list(first[key])
+        for page in pages:
+            items.extend(page[key])
+
+        return items, total
+
+# shared by all services:
+provider = Provider( 
+    domain = config['default'].AUTH0_DOMAIN_URL, 
+    token = config['default'].AUTH0_MANAGEMENT_TOKEN,
+    algorithms = config['default'].AUTH0_ALGORITHMS,
+    pool_size = config['default'].AUTH0_HTTP_POOL_SIZE,
+    timeout = (
+        config['default'].AUTH0_HTTP_CONNECT_TIMEOUT, 
+        config['default'].AUTH0_HTTP_READ_TIMEOUT
+    ),
+    retries = config['default'].AUTH0_HTTP_MAX_RETRIES,
+    backoff_factor = config['default'].AUTH0_HTTP_BACKOFF_FACTOR
+)
+# shared by bulk jobs:
+async_provider = AsyncProvider(
+    domain = config['default'].AUTH0_DOMAIN_URL, 
+    token = config['default'].AUTH0_MANAGEMENT_TOKEN,
+    concurrency = config['default'].AUTH0_HTTP_CONCURRENCY,
+    timeout = (
+        config['default'].AUTH0_HTTP_CONNECT_TIMEOUT, 
+        config['default'].AUTH0_HTTP_READ_TIMEOUT
+    ),
+    retries = config['default'].AUTH0_HTTP_MAX_RETRIES,
+    backoff_factor = config['default'].AUTH0_HTTP_BACKOFF_FACTOR
+)
+
 #  user profile services
 #  ----------------------------------------------------------------
 class UserByEmail(Resource):
     # backend:
-    provider = Provider( 
-        domain = config['default'].AUTH0_DOMAIN_URL, 
-        token = config['default'].AUTH0_MANAGEMENT_TOKEN,
-        algorithms = config['default'].AUTH0_ALGORITHMS,
-    )
+    provider = provider
     # endpoint:
     url = f'{config["default"].AUTH0_DOMAIN_URL}api/v2/users-by-email'
 
@@ -186,11 +432,8 @@ class UserByEmail(Resource):
 #  ----------------------------------------------------------------
 class Users(Resource):
     # backend:
-    provider = Provider( 
-        domain = config['default'].AUTH0_DOMAIN_URL, 
-        token = config['default'].AUTH0_MANAGEMENT_TOKEN,
-        algorithms = config['default'].AUTH0_ALGORITHMS,
-    )
+    provider = provider
+    async_provider = async_provider
     # endpoint:
     url = f'{config["default"].AUTH0_DOMAIN_URL}api/v2/users'
 
@@ -202,6 +445,17 @@ class Users(Resource):
 
         return response.json()
 
+    def get_all(self, params={}):
+        """ list all users, pages are fetched concurrently
+            - return (users, total)
+        """
+        return asyncio.run(
+            self.async_provider.get_pages(
+                self.url, 'users', params, 
+                per_page = config['default'].AUTH0_USERS_PER_PAGE
+            )
+        )
+
     def post(self, email, password):
         """ create a user
         """
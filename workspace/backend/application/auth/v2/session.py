@@ -1,4 +1,24 @@
+from flask import g, session
+
+
 class Session:
     ID = 'id'
     TOKEN = 'token'
-    PROFILE = 'profile'
\ No newline at end of file
+    PROFILE = 'profile'
+    # unix timestamp of the last follow / unfollow, newer than cached follows of other workers:
+    FOLLOWS_CHANGED_AT = 'follows_changed_at'
+
+def load_current_user():
+    """ DelegatedUser of current session, queried once per request
+    """
+    if not (Session.ID in session):
+        return None
+
+    user = g.get('delegated_user')
+    # g outlives requests that share an app context, e.g. in tests:
+    if (user is None) or (user.id != session[Session.ID]):
+        from .models import DelegatedUser
+
+        user = g.delegated_user = DelegatedUser.query.get(session[Session.ID])
+
+    return user
@@ -10,10 +10,14 @@ from .session import Session
 from .forms import LoginForm, RegistrationForm
 from .models import DelegatedUser
 from .decorators import requires_auth
+from .services import AuthError, provider
 
 import json
 from datetime import datetime
 
+# claims the session profile is built from:
+PROFILE_CLAIMS = ('sub', 'nickname', 'updated_at')
+
 @bp.route('/token', methods=['GET'])
 def get_token():
     """ Get JWT token for Swagger API interaction
@@ -43,17 +47,30 @@ def callback():
         - session setup
     """
     # authorize connection:
-    token = current_app.config['AUTH0'].authorize_access_token()
+    auth0 = current_app.config['AUTH0']
+    token = auth0.authorize_access_token()
     flash(f'Your ID Token {token["id_token"]}')
-    # get user profile
+    # get user profile from id token claims, verified against the cached JWKS:
+    try:
+        userinfo = provider.decode_id_token(
+            current_app.config['AUTH0_CLIENT_ID'],
+            token,
+            nonce = auth0.framework.get_session_data(request, 'nonce')
+        )
+    except AuthError as e:
+        flash(f'Login failed. {e.error["description"]}')
+        return redirect(url_for('main.index'))
+    # only if claims are missing:
     #
     # GET https://DOMAIN/userinfo
     # Authorization: 'Bearer {ACCESS_TOKEN}'
     # 
-    response = current_app.config['AUTH0'].get('userinfo')
-    userinfo = response.json()
+    if not all(claim in userinfo for claim in PROFILE_CLAIMS):
+        response = auth0.get('userinfo')
+        userinfo.update(response.json())
 
-    # set up session:
+    # set up session, under a new id:
+    session.regenerate()
     _, id = userinfo['sub'].split('|')
     session[Session.ID] = id
     session[Session.TOKEN] = token
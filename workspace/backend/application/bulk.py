@@ -0,0 +1,99 @@
+import csv
+import io
+import itertools
+import os
+import tempfile
+
+from psycopg2.extras import execute_values
+
+
+def batched(rows, batch_size):
+    """ lists of at most batch_size rows
+    """
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            break
+        yield batch
+
+def copy_rows(connection, table, columns, rows):
+    """ load rows into table with COPY ... FROM STDIN, None is loaded as NULL
+        - return the number of loaded rows
+    """
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(
+            'COPY {} ({}) FROM STDIN WITH (FORMAT csv)'.format(table, ', '.join(columns)), 
+            buffer
+        )
+
+        return cursor.rowcount
+    finally:
+        cursor.close()
+
+def stream_batches(connection, statement, batch_size, **params):
+    """ rows of statement in batches, fetched through a server-side cursor
+    """
+    result = connection.execution_options(
+        stream_results = True
+    ).execute(statement, **params)
+
+    try:
+        while True:
+            rows = result.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        result.close()
+
+def update_from_values(connection, sql, rows, template=None):
+    """ run UPDATE ... FROM (VALUES %s) for all rows in one statement
+        - return the number of updated rows
+    """
+    cursor = connection.connection.cursor()
+    try:
+        execute_values(
+            cursor, sql, rows, 
+            template = template, 
+            page_size = max(len(rows), 1)
+        )
+
+        return cursor.rowcount
+    finally:
+        cursor.close()
+
+
+class Checkpoint:
+    """ last processed key of a resumable job, persisted in file
+    """
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        """ last processed key, None if the job has not started yet
+        """
+        if (self.path is None) or not os.path.exists(self.path):
+            return None
+
+        with open(self.path) as f:
+            return int(f.read().strip())
+
+    def save(self, key):
+        if self.path is None:
+            return
+
+        # atomic, a crash never leaves a partial checkpoint:
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)))
+        with os.fdopen(fd, 'w') as f:
+            f.write(str(key))
+        os.replace(temp_path, self.path)
+
+    def clear(self):
+        if not (self.path is None) and os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,100 @@
+import time
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """ thread-safe, bounded, least-recently-used cache
+        - each entry can carry its own expiry as unix timestamp
+        - capacity counts entries, or the sum of weigh(value) if given, e.g. sizes in bytes
+        - hit / miss counters are kept for monitoring
+    """
+    def __init__(self, capacity, weigh=None):
+        self.capacity = capacity
+        self.weigh = weigh
+        # sum of entry weights:
+        self.weight = 0
+
+        # stats:
+        self.hits = 0
+        self.misses = 0
+
+        # key -> (value, expires_at, weight):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return not (self.get(key) is None)
+
+    def get(self, key, default=None):
+        """ get value, default if missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if not (entry is None):
+                value, expires_at, _ = entry
+                if (expires_at is None) or (time.time() < expires_at):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                # expired:
+                self._pop(key)
+
+            self.misses += 1
+            return default
+
+    def set(self, key, value, expires_at=None):
+        """ set value, evict least recently used entries beyond capacity
+            - values weighing more than capacity on their own are not kept
+        """
+        weight = 1 if (self.weigh is None) else self.weigh(value)
+
+        with self._lock:
+            self._pop(key)
+            if weight > self.capacity:
+                return
+
+            self._entries[key] = (value, expires_at, weight)
+            self.weight += weight
+
+            while self.weight > self.capacity:
+                self._pop(next(iter(self._entries)))
+
+    def delete(self, key):
+        """ drop value
+        """
+        with self._lock:
+            self._pop(key)
+
+    def _pop(self, key):
+        entry = self._entries.pop(key, None)
+        if not (entry is None):
+            self.weight -= entry[2]
+
+    def clear(self):
+        """ drop all values and reset stats
+        """
+        with self._lock:
+            self._entries.clear()
+            self.weight = 0
+            self.hits = 0
+            self.misses = 0
+
+    @property
+    def stats(self):
+        """ cache summary
+        """
+        requests = self.hits + self.misses
+
+        return {
+            "size": len(self._entries),
+            "weight": self.weight,
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / requests) if requests else 0.0
+        }
@@ -0,0 +1,45 @@
+from alembic.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from flask import current_app
+
+from application import db
+
+# revision of the schema created by db.create_all() before migrations were introduced:
+BASELINE_REVISION = '55bfb3049f08'
+
+# migration script heads, by migrations directory:
+_heads = {}
+
+def head_revisions():
+    """ revisions the schema should be at, empty if migrations are not enabled
+    """
+    migrate = current_app.extensions.get('migrate')
+    if migrate is None:
+        return set()
+
+    if not (migrate.directory in _heads):
+        config = migrate.migrate.get_config(migrate.directory)
+        _heads[migrate.directory] = set(
+            ScriptDirectory.from_config(config).get_heads()
+        )
+
+    return _heads[migrate.directory]
+
+def current_revisions(connection):
+    """ revisions the schema is at
+    """
+    return set(
+        MigrationContext.configure(connection).get_current_heads()
+    )
+
+def is_legacy(connection):
+    """ condition -- schema created by db.create_all() without migration history
+    """
+    return (not current_revisions(connection)) and db.engine.dialect.has_table(connection, 'posts')
+
+def has_pending_migrations(connection):
+    """ condition -- schema is behind migration scripts
+    """
+    heads = head_revisions()
+
+    return bool(heads) and current_revisions(connection) != heads
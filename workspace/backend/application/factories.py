@@ -0,0 +1,30 @@
+""" fake data generators for tests and seeding commands, not imported by the app itself
+"""
+from application import db
+from application.models import Post
+from uuid import uuid4
+
+import factory
+import factory.fuzzy
+from faker import Faker
+
+from datetime import datetime, timezone
+
+fake = Faker()
+
+#----------------------------------------------------------------------------#
+# posts
+#----------------------------------------------------------------------------#
+class PostFactory(factory.alchemy.SQLAlchemyModelFactory):
+    """ test post generator
+    """
+    class Meta:
+        model = Post
+        sqlalchemy_session = db.session
+
+    # use faker API to generate better test data:
+    title = factory.Faker('sentence', nb_words=4)
+    contents = factory.Faker('text')
+    timestamp = factory.fuzzy.FuzzyDateTime(datetime(2018, 1, 1, tzinfo=timezone.utc))
+
+    author_id = factory.Sequence(lambda n: uuid4().hex)
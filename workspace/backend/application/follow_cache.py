@@ -0,0 +1,68 @@
+import time
+
+from application import db
+from application.cache import LRUCache
+from application.models import Follow
+
+class FollowedCache:
+    """ ids of the users each user follows, so follow checks are set lookups
+        - per worker process, entries expire after ttl
+        - commits of follows / unfollows drop the follower's entry in this process,
+          readers pass since to skip entries fetched before a change made elsewhere
+    """
+    def __init__(self, capacity=4096):
+        self._ids = LRUCache(capacity)
+        self.ttl = 30
+
+    def init_app(self, app):
+        """ integrate with app factory
+        """
+        self._ids.capacity = app.config['FOLLOWS_CACHE_SIZE']
+        self._ids.clear()
+        self.ttl = app.config['FOLLOWS_CACHE_TTL']
+
+    def get(self, user_id, since=None):
+        """ ids of users followed by given user, fetched after since as unix timestamp
+        """
+        entry = self._ids.get(user_id)
+
+        if (entry is None) or (not (since is None) and entry[1] < since):
+            fetched_at = time.time()
+            followed_ids = frozenset(
+                followed_id for (followed_id, ) in db.session.query(
+                    Follow.followed_id
+                ).filter(
+                    Follow.follower_id == user_id
+                )
+            )
+            entry = (followed_ids, fetched_at)
+            self._ids.set(user_id, entry, fetched_at + self.ttl)
+
+        return entry[0]
+
+    def invalidate(self, user_ids):
+        """ drop entries of given users
+        """
+        for user_id in user_ids:
+            self._ids.delete(user_id)
+
+followed_cache = FollowedCache()
+
+#----------------------------------------------------------------------------#
+# invalidation on follow writes
+#----------------------------------------------------------------------------#
+# session.info key of the ids of users whose follows changed:
+FOLLOWS_CHANGED = 'follows_changed'
+
+def follows_changed(user_id):
+    """ drop cached follows of given user once the transaction commits
+    """
+    db.session.info.setdefault(FOLLOWS_CHANGED, set()).add(user_id)
+
+@db.event.listens_for(db.session, 'after_commit')
+def drop_changed_follows(session):
+    followed_cache.invalidate(session.info.pop(FOLLOWS_CHANGED, ()))
+
+@db.event.listens_for(db.session, 'after_soft_rollback')
+def discard_changed_follows(session, previous_transaction):
+    session.info.pop(FOLLOWS_CHANGED, None)
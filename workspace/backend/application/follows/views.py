@@ -1,10 +1,13 @@
+import time
+
 from application import db
 from application.auth.v2.models import DelegatedUser
 from application.auth.v2.decorators import requires_auth
+from application.timeline import timeline
 
 from flask import current_app
 from flask import session
-from application.auth.v2.session import Session
+from application.auth.v2.session import Session, load_current_user
 from flask import flash, request, render_template, redirect, url_for
 
 from . import bp
@@ -21,17 +24,15 @@ def follow(user_id):
     )
 
     # get current user:
-    current_user = DelegatedUser.query.get(
-        session[Session.ID]
-    )
+    current_user = load_current_user()
 
-    # check follow:
-    if current_user.is_following(user):
-        flash('You are already following this user.')
-    else:
-        current_user.follow(user)
+    # follow, no-op if already following:
+    if current_user.follow(user):
         db.session.commit()
+        session[Session.FOLLOWS_CHANGED_AT] = time.time()
         flash(f'You are now following {user.nickname}.')
+    else:
+        flash('You are already following this user.')
 
     return redirect(url_for('users.show_user', user_id=user_id))
 
@@ -47,17 +48,17 @@ def unfollow(user_id):
     )
 
     # get current user:
-    current_user = DelegatedUser.query.get(
-        session[Session.ID]
-    )
+    current_user = load_current_user()
 
-    # check follow:
-    if not current_user.is_following(user):
-        flash('You are currently not following this user.')
-    else:
-        current_user.unfollow(user)
+    # unfollow, no-op if not following:
+    if current_user.unfollow(user):
+        # posts fanned out to current user's timeline go with the follow:
+        timeline.on_unfollow(current_user.id, user.id)
         db.session.commit()
+        session[Session.FOLLOWS_CHANGED_AT] = time.time()
         flash(f'You are now not following {user.nickname}.')
+    else:
+        flash('You are currently not following this user.')
 
     return redirect(url_for('users.show_user', user_id=user_id))
 
@@ -0,0 +1,67 @@
+import hashlib
+from functools import wraps
+
+from flask import current_app, request, session
+from werkzeug.http import http_date, is_resource_modified, quote_etag
+
+from application.auth.v2.session import Session
+
+
+class NotModified(Exception):
+    """ raised by views once the client's cached copy is known to be current
+    """
+    def __init__(self, response):
+        self.response = response
+
+def make_etag(*parts):
+    """ strong etag of the representation identified by given parts
+    """
+    parts = (current_app.config['HTTP_ETAG_VERSION'], ) + parts
+
+    return hashlib.sha1(
+        '|'.join(str(part) for part in parts).encode('utf-8')
+    ).hexdigest()
+
+def make_page_etag(*parts):
+    """ etag of a page rendered for current session, None while flashes are pending
+    """
+    # the page would consume them:
+    if '_flashes' in session:
+        return None
+
+    return make_etag(session.get(Session.ID), Session.TOKEN in session, *parts)
+
+def validate(etag, last_modified=None):
+    """ validators and cache policy of current endpoint, as response headers
+        - raise NotModified if the client's cached copy is current
+    """
+    headers = {}
+    if etag is None:
+        return headers
+
+    headers['ETag'] = quote_etag(etag)
+    if not (last_modified is None):
+        headers['Last-Modified'] = http_date(last_modified)
+    cache_control = current_app.config['HTTP_CACHE_CONTROL'].get(request.endpoint)
+    if not (cache_control is None):
+        headers['Cache-Control'] = cache_control
+
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        raise NotModified(
+            current_app.response_class(status=304, headers=headers)
+        )
+
+    return headers
+
+def conditional(view):
+    """ serve NotModified raised by given view as 304
+        - for restplus resources, apply outside marshal_with
+    """
+    @wraps(view)
+    def decorated(*args, **kwargs):
+        try:
+            return view(*args, **kwargs)
+        except NotModified as e:
+            return e.response
+
+    return decorated
@@ -1,4 +1,9 @@
-from flask import render_template
+from flask import render_template, jsonify
+from sqlalchemy.exc import SQLAlchemyError
+
+from application import db
+from application.deploy import has_pending_migrations
+
 from . import bp
 
 @bp.route('/')
@@ -6,4 +11,25 @@ def index():
     """ welcome to uda social blogging as capstone project!
     """
 
-    return render_template('pages/home.html')
\ No newline at end of file
+    return render_template('pages/home.html')
+
+@bp.route('/healthz')
+def healthz():
+    """ liveness probe -- process is serving requests
+    """
+    return jsonify({"status": "ok"})
+
+@bp.route('/readyz')
+def readyz():
+    """ readiness probe -- database is reachable and schema is up to date
+    """
+    try:
+        with db.engine.connect() as connection:
+            pending = has_pending_migrations(connection)
+    except SQLAlchemyError:
+        return jsonify({"status": "unavailable", "reason": "database unreachable"}), 503
+
+    if pending:
+        return jsonify({"status": "unavailable", "reason": "pending migrations"}), 503
+
+    return jsonify({"status": "ok"})
@@ -1,20 +1,28 @@
 from application import db
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import inspect
+from sqlalchemy.dialects.postgresql import UUID, insert
+from sqlalchemy.schema import CreateIndex
+from sqlalchemy.ext.compiler import compiles
 from uuid import uuid4
 
-import factory
-import factory.fuzzy
-from faker import Faker
-
-from datetime import datetime, timezone
+from datetime import datetime
 import random
 import json
+import time
+
+# markdown rendering:
+from application.rendering import renderer
+
+# covering indexes -- CREATE INDEX ... INCLUDE isn't supported by SQLAlchemy 1.3:
+@compiles(CreateIndex, 'postgresql')
+def create_index_with_include(create, compiler, **kwargs):
+    ddl = compiler.visit_create_index(create, **kwargs)
 
-# markdown rich text editor:
-from markdown import markdown
-import bleach
+    include = create.element.info.get('postgresql_include')
+    if include:
+        ddl += ' INCLUDE ({})'.format(', '.join(include))
 
-fake = Faker()
+    return ddl
 
 #----------------------------------------------------------------------------#
 # posts
@@ -22,8 +30,11 @@ fake = Faker()
 class Post(db.Model):
     # follow the best practice
     __tablename__ = 'posts'    
+
+    # name of post listings in listing_versions:
+    LISTING = 'posts'
     
-    # primary key:
+    # primary key, allocated by the serial sequence in INSERT ... RETURNING id:
     id = db.Column(db.Integer, primary_key=True)    
     
     # for public exposure:
@@ -32,42 +43,45 @@ class Post(db.Model):
     # post info:
     title = db.Column(db.Text, nullable=False)
     contents = db.Column(db.Text, nullable=False)
-    contents_html = db.Column(db.Text, nullable=False)
-    timestamp = db.Column(db.DateTime, index=True, default=datetime.utcnow())    
+    # rendered html, empty until rendered in deferred render mode:
+    contents_html = db.Column(db.Text)
+    render_version = db.Column(db.Integer)
+    rendered_at = db.Column(db.DateTime)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow)    
     
     # relationship with users -- many-to-one
     author_id = db.Column(db.String(64), db.ForeignKey('delegated_users.id'))    
 
+    # indexes:
+    __table_args__ = (
+        # latest posts of an author:
+        db.Index('ix_posts_author_id_timestamp_id', author_id, timestamp.desc(), id.desc()),
+        # post listings, newest first, incl. keyset pagination over (timestamp, id),
+        # answered from the index alone:
+        db.Index(
+            'ix_posts_timestamp_id_covering', timestamp.desc(), id.desc(),
+            info={'postgresql_include': ['uuid', 'title', 'author_id']}
+        ),
+    )
+
     # triggers:
     @staticmethod
     def on_contents_set(target, value, old_value, initiator):
         """ on contents set hook
         """
-        # html tag whitelist:
-        allowed_tags = [
-            'a', 
-            'abbr', 
-            'acronym', 
-            'b', 
-            'blockquote', 
-            'code',
-            'em', 
-            'i', 
-            'li', 
-            'ol', 
-            'pre', 
-            'strong', 
-            'ul',
-            'h1', 'h2', 'h3', 
-            'p'
-        ]
-        target.contents_html = bleach.linkify(
-            bleach.clean(
-                markdown(value, output_format='html'),
-                tags=allowed_tags, 
-                strip=True
-            )
-        )
+        renderer.on_contents_set(target, value, old_value)
+
+    @staticmethod
+    def listing_version():
+        """ version of post listings, bumped by every transaction that may change a page of them
+        """
+        return ListingVersion.get(Post.LISTING)
+
+    @staticmethod
+    def mark_listing_changed(session=None):
+        """ bump the version of post listings on commit, for writes the session doesn't track
+        """
+        (db.session if (session is None) else session).info[LISTING_CHANGED] = True
 
     def _format_timestamp_default(self):
         """ format timestamp
@@ -103,26 +117,105 @@ class Post(db.Model):
         self.timestamp = datetime.utcnow() if (not 'timestamp' in data) else \
             datetime.strptime(data['timestamp'], "%Y-%m-%dT%H:%M:%S.%fZ")
 
-# triggers:
-db.event.listen(Post.contents, 'set', Post.on_contents_set)
+# triggers, with the previous contents loaded to detect unchanged ones:
+db.event.listen(Post.contents, 'set', Post.on_contents_set, active_history=True)
+
+#----------------------------------------------------------------------------#
+# listing versions
+#----------------------------------------------------------------------------#
+class ListingVersion(db.Model):
+    # follow the best practice
+    __tablename__ = 'listing_versions'
 
-# fake data generator:
-class PostFactory(factory.alchemy.SQLAlchemyModelFactory):
-    """ test post generator
+    # primary key -- one version per listing:
+    name = db.Column(db.String(64), primary_key=True)
+
+    # attributes:
+    # bumped within each transaction changing the listing, so validators of
+    # the listing cost a primary key lookup instead of a scan:
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+
+    @staticmethod
+    def get(name):
+        """ current version of given listing, 0 if it never changed
+        """
+        value = db.session.query(
+            ListingVersion.value
+        ).filter(
+            ListingVersion.name == name
+        ).scalar()
+
+        return 0 if (value is None) else value
+
+    @staticmethod
+    def bump(name, session=None):
+        """ advance version of given listing, committed along with the change
+            - a new listing starts at the current time in microseconds, so recreating
+              the table doesn't reissue versions clients may still hold
+        """
+        statement = insert(ListingVersion).values(name = name, value = int(time.time() * 1e6))
+
+        (db.session if (session is None) else session).execute(
+            statement.on_conflict_do_update(
+                index_elements = [ListingVersion.name],
+                set_ = {"value": ListingVersion.value + 1}
+            )
+        )
+
+def listing_changed(session):
+    """ whether flushed changes of session show on post listings
+        - call from after_flush, while session.new, .dirty and .deleted still hold them
+        - the version itself is bumped right before commit, see bump_listing_version
     """
-    class Meta:
-        model = Post
-        sqlalchemy_session = db.session
+    from application.auth.v2.models import DelegatedUser
+
+    for instance in list(session.new) + list(session.deleted):
+        if isinstance(instance, Post):
+            return True
+
+    for instance in session.dirty:
+        if isinstance(instance, Post) and session.is_modified(instance):
+            return True
+        # author nicknames are listed along with posts:
+        if isinstance(instance, DelegatedUser) and inspect(instance).attrs.nickname.history.has_changes():
+            return True
+
+    return False
+
+# session.info key, set once a change of post listings is flushed:
+LISTING_CHANGED = 'listing_changed'
 
-    # id should start from 1:
-    id = factory.Sequence(lambda n: n + 1)
+@db.event.listens_for(db.session, 'after_flush')
+def collect_listing_changes(session, flush_context):
+    if listing_changed(session):
+        session.info[LISTING_CHANGED] = True
 
-    # use faker API to generate better test data:
-    title = factory.Faker('sentence', nb_words=4)
-    contents = factory.Faker('text')
-    timestamp = factory.fuzzy.FuzzyDateTime(datetime(2018, 1, 1, tzinfo=timezone.utc))
+@db.event.listens_for(db.session, 'after_bulk_update')
+def collect_listing_bulk_update(update_context):
+    from application.auth.v2.models import DelegatedUser
 
-    author_id = factory.Sequence(lambda n: uuid4().hex)
+    if update_context.mapper.class_ in (Post, DelegatedUser):
+        update_context.session.info[LISTING_CHANGED] = True
+
+@db.event.listens_for(db.session, 'after_bulk_delete')
+def collect_listing_bulk_delete(delete_context):
+    if delete_context.mapper.class_ is Post:
+        delete_context.session.info[LISTING_CHANGED] = True
+
+@db.event.listens_for(db.session, 'before_commit')
+def bump_listing_version(session):
+    # savepoints leave it to the enclosing transaction:
+    if session.transaction.nested:
+        return
+
+    # the bump locks the version row until commit, so it goes last, after the final flush:
+    session.flush()
+    if session.info.pop(LISTING_CHANGED, False):
+        ListingVersion.bump(Post.LISTING, session)
+
+@db.event.listens_for(db.session, 'after_soft_rollback')
+def discard_listing_changes(session, previous_transaction):
+    session.info.pop(LISTING_CHANGED, None)
 
 #----------------------------------------------------------------------------#
 # follows
@@ -139,5 +232,83 @@ class Follow(db.Model):
     followed_id = db.Column(db.String(64), db.ForeignKey('delegated_users.id')) 
 
     # attributes:
-    timestamp = db.Column(db.DateTime, index=True, default=datetime.utcnow()) 
+    timestamp = db.Column(db.DateTime, index=True, default=datetime.utcnow) 
+
+    __table_args__ = (
+        # one follow per pair, also serves lookups and listings by follower:
+        db.UniqueConstraint(follower_id, followed_id, name='uq_follows_follower_id_followed_id'),
+        # followers of given user, newest first:
+        db.Index('ix_follows_followed_id_timestamp', followed_id, timestamp),
+    )
+
+
+
+#----------------------------------------------------------------------------#
+# timelines
+#----------------------------------------------------------------------------#
+class TimelineEntry(db.Model):
+    # follow the best practice
+    __tablename__ = 'timeline_entries'
+    __table_args__ = (
+        # newest first scan of one user's timeline:
+        db.Index('ix_timeline_entries_user_id_timestamp_post_id', 'user_id', 'timestamp', 'post_id'),
+    )
+
+    # primary key -- one entry per post per timeline owner:
+    user_id = db.Column(db.String(64), db.ForeignKey('delegated_users.id', ondelete='CASCADE'), primary_key=True)
+    post_id = db.Column(db.Integer, db.ForeignKey('posts.id', ondelete='CASCADE'), primary_key=True)
+
+    # post creation time, ordering key:
+    timestamp = db.Column(db.DateTime, nullable=False)
+
+#----------------------------------------------------------------------------#
+# sync watermarks
+#----------------------------------------------------------------------------#
+class SyncWatermark(db.Model):
+    # follow the best practice
+    __tablename__ = 'sync_watermarks'
+
+    # primary key -- one watermark per sync job:
+    name = db.Column(db.String(64), primary_key=True)
+
+    # attributes:
+    # newest change already synced from the source:
+    value = db.Column(db.DateTime, nullable=False)
+    synced_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
+    @staticmethod
+    def get(name):
+        """ watermark of given sync job, None if it never ran
+        """
+        watermark = SyncWatermark.query.get(name)
+
+        return None if (watermark is None) else watermark.value
+
+    @staticmethod
+    def set(name, value):
+        """ record watermark of given sync job, committed along with the synced rows
+        """
+        watermark = SyncWatermark.query.get(name)
+        if watermark is None:
+            watermark = SyncWatermark(name = name, value = value)
+        else:
+            watermark.value = value
+            watermark.synced_at = datetime.utcnow()
+
+        db.session.add(watermark)
+
+#----------------------------------------------------------------------------#
+# server-side sessions
+#----------------------------------------------------------------------------#
+class StoredSession(db.Model):
+    # follow the best practice
+    __tablename__ = 'server_sessions'
+
+    # primary key -- sha256 of the session id kept in the cookie:
+    id = db.Column(db.String(64), primary_key=True)
+
+    # attributes:
+    # session dict, serialized like Flask's cookie sessions:
+    data = db.Column(db.Text, nullable=False)
+    # idle sessions expire, removed in batches by flask sweep-sessions:
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
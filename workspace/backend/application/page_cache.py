@@ -0,0 +1,257 @@
+import fcntl
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+from application import db
+from application.cache import LRUCache
+
+#----------------------------------------------------------------------------#
+# backends
+#----------------------------------------------------------------------------#
+class MemoryBackend:
+    """ in-process store -- invalidation is not seen by other workers, use with one worker
+    """
+    def __init__(self, capacity=256):
+        self._entries = LRUCache(capacity)
+        # counters are never evicted:
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self._entries.get(key)
+
+    def set(self, key, value, ttl):
+        self._entries.set(key, value, time.time() + ttl)
+
+    def add(self, key, value, ttl):
+        """ set value unless key is present, return whether it was set
+        """
+        with self._lock:
+            # one lookup, counted once in the stats:
+            if not (self._entries.get(key) is None):
+                return False
+            self.set(key, value, ttl)
+            return True
+
+    def delete(self, key):
+        self._entries.delete(key)
+
+    def get_counter(self, key):
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+class FileBackend:
+    """ store under directory, shared by the workers of one host
+        - each entry is one file, its first line is the expiry as unix timestamp
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+    def _read(self, path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                expires_at, value = f.read().split('\n', 1)
+        except (OSError, ValueError):
+            return None
+
+        return value if (time.time() < float(expires_at)) else None
+
+    def get(self, key):
+        return self._read(self._path(key))
+
+    def set(self, key, value, ttl):
+        # atomic, readers never see partial files:
+        fd, temp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(f'{time.time() + ttl}\n{value}')
+        os.replace(temp_path, self._path(key))
+
+    def add(self, key, value, ttl):
+        """ set value unless key is present, return whether it was set
+        """
+        path = self._path(key)
+        # an expired entry, e.g. the lock of a crashed worker, is taken over:
+        if os.path.exists(path) and (self._read(path) is None):
+            self.delete(key)
+
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(f'{time.time() + ttl}\n{value}')
+        return True
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def get_counter(self, key):
+        try:
+            with open(self._path(key)) as f:
+                return int(f.read() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def incr(self, key):
+        path = self._path(key)
+        # increments are serialized by a lock file of their own:
+        with open(f'{path}.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            value = self.get_counter(key) + 1
+            # replaced atomically, readers never see the counter half-written:
+            fd, temp_path = tempfile.mkstemp(dir=self.directory)
+            with os.fdopen(fd, 'w') as f:
+                f.write(str(value))
+            os.replace(temp_path, path)
+            return value
+
+class RedisBackend:
+    """ store in Redis or a Redis-compatible server, shared by all hosts
+    """
+    def __init__(self, url):
+        # optional dependency, only needed with this backend:
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+
+    def get(self, key):
+        value = self._redis.get(key)
+        return None if (value is None) else value.decode('utf-8')
+
+    def set(self, key, value, ttl):
+        self._redis.set(key, value, ex=int(ttl))
+
+    def add(self, key, value, ttl):
+        """ set value unless key is present, return whether it was set
+        """
+        return bool(self._redis.set(key, value, ex=int(ttl), nx=True))
+
+    def delete(self, key):
+        self._redis.delete(key)
+
+    def get_counter(self, key):
+        return int(self._redis.get(key) or 0)
+
+    def incr(self, key):
+        return self._redis.incr(key)
+
+#----------------------------------------------------------------------------#
+# page cache
+#----------------------------------------------------------------------------#
+class PageCache:
+    """ rendered pages keyed by name, parts and a generation counter
+        - writes bump the generation, so pages rendered before are never served again
+          and expire by ttl
+        - on a miss only one worker renders the page, the others wait for it
+          for up to lock_timeout, then render it themselves
+    """
+    BACKENDS = {
+        'memory': lambda app: MemoryBackend(app.config['PAGE_CACHE_SIZE']),
+        'file': lambda app: FileBackend(app.config['PAGE_CACHE_DIR']),
+        'redis': lambda app: RedisBackend(app.config['PAGE_CACHE_REDIS_URL'])
+    }
+    GENERATION = 'page:generation'
+    # seconds between checks for a page being rendered by another worker:
+    POLL_INTERVAL = 0.05
+
+    def __init__(self):
+        self.backend = None
+        self.ttl = 300
+        self.lock_timeout = 10
+        self.max_pages = 0
+
+    def init_app(self, app):
+        """ integrate with app factory
+        """
+        backend = app.config['PAGE_CACHE_BACKEND']
+        if not (backend is None) and not (backend in PageCache.BACKENDS):
+            raise ValueError(f'Unknown page cache backend {backend}')
+
+        self.backend = None if (backend is None) else PageCache.BACKENDS[backend](app)
+        self.ttl = app.config['PAGE_CACHE_TTL']
+        self.lock_timeout = app.config['PAGE_CACHE_LOCK_TIMEOUT']
+        self.max_pages = app.config['PAGE_CACHE_MAX_PAGES']
+
+    @property
+    def enabled(self):
+        return not (self.backend is None)
+
+    def generation(self):
+        return self.backend.get_counter(PageCache.GENERATION)
+
+    def bump(self):
+        """ invalidate all cached pages
+        """
+        if self.enabled:
+            self.backend.incr(PageCache.GENERATION)
+
+    def get_or_render(self, name, parts, render):
+        """ cached page, rendered by render() on a miss
+        """
+        key = ':'.join(['page', name, str(self.generation())] + [str(part) for part in parts])
+
+        html = self.backend.get(key)
+        if not (html is None):
+            return html
+
+        # stampede protection:
+        lock = f'{key}:lock'
+        if self.backend.add(lock, str(os.getpid()), self.lock_timeout):
+            try:
+                html = render()
+                self.backend.set(key, html, self.ttl)
+            finally:
+                self.backend.delete(lock)
+
+            return html
+
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(PageCache.POLL_INTERVAL)
+            html = self.backend.get(key)
+            if not (html is None):
+                return html
+
+        return render()
+
+page_cache = PageCache()
+
+#----------------------------------------------------------------------------#
+# invalidation on post writes
+#----------------------------------------------------------------------------#
+# session.info key of the flag set by flushes of listed changes:
+PAGES_CHANGED = 'pages_changed'
+
+@db.event.listens_for(db.session, 'after_flush')
+def collect_page_changes(session, flush_context):
+    if not page_cache.enabled:
+        return
+
+    from application.models import listing_changed
+
+    if listing_changed(session):
+        session.info[PAGES_CHANGED] = True
+
+@db.event.listens_for(db.session, 'after_commit')
+def bump_page_generation(session):
+    if session.info.pop(PAGES_CHANGED, False):
+        page_cache.bump()
+
+@db.event.listens_for(db.session, 'after_soft_rollback')
+def discard_page_changes(session, previous_transaction):
+    session.info.pop(PAGES_CHANGED, None)
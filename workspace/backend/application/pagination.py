@@ -0,0 +1,65 @@
+import base64
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+# cursor timestamp format:
+CURSOR_TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+
+def encode_cursor(timestamp, id):
+    """ encode (timestamp, id) as opaque url-safe cursor
+    """
+    raw = f'{timestamp.strftime(CURSOR_TIMESTAMP_FORMAT)}|{id}'
+
+    return base64.urlsafe_b64encode(
+        raw.encode('utf-8')
+    ).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """ decode opaque cursor into (timestamp, id)
+        - raise ValueError for malformed cursor
+    """
+    try:
+        raw = base64.urlsafe_b64decode(
+            (cursor + '=' * (-len(cursor) % 4)).encode('ascii')
+        ).decode('utf-8')
+        timestamp, id = raw.split('|')
+
+        return datetime.strptime(timestamp, CURSOR_TIMESTAMP_FORMAT), int(id)
+    except ValueError:
+        raise ValueError(f'Invalid cursor {cursor}')
+
+
+class KeysetPagination:
+    """ keyset pagination over (timestamp, id), newest first
+        - seek predicate instead of OFFSET, so deep pages cost the same as the first one
+        - no COUNT(*), only whether there is a next page
+    """
+    def __init__(self, query, timestamp, id, after, per_page):
+        """ paginate query whose rows expose timestamp and id columns
+            - after: cursor of the last row on previous page, empty for the first page
+        """
+        if after:
+            query = query.filter(
+                tuple_(timestamp, id) < tuple_(*decode_cursor(after))
+            )
+
+        # one extra row tells whether there is a next page:
+        rows = query.order_by(
+            timestamp.desc(),
+            id.desc()
+        ).limit(
+            per_page + 1
+        ).all()
+
+        self.after = after
+        self.per_page = per_page
+        self.items = rows[:per_page]
+        self.has_next = len(rows) > per_page
+        self.next_cursor = None
+        if self.has_next:
+            last = self.items[-1]
+            self.next_cursor = encode_cursor(
+                getattr(last, timestamp.key),
+                getattr(last, id.key)
+            )
@@ -0,0 +1,173 @@
+import sys
+import time
+import uuid
+
+from sqlalchemy import inspect
+
+from application import db
+from application.cache import LRUCache
+from application.page_cache import page_cache
+from application.rendering import renderer
+
+def sizeof(post):
+    """ approximate memory footprint of a serialized post, in bytes
+    """
+    return sys.getsizeof(post) + sum(sys.getsizeof(value) for value in post.values())
+
+class PostCache:
+    """ post details by uuid, read through from the database
+        - bounded in bytes, so a few huge posts evict many small ones instead of growing memory
+        - per worker process, hits are served without a query:
+          with a page cache shared by workers, entries are tagged with its generation and
+          dropped once a write anywhere bumps it, otherwise they expire after ttl
+        - commits in this process drop entries of written posts right away
+    """
+    def __init__(self):
+        self.cache = LRUCache(0, weigh=lambda entry: sizeof(entry[0]))
+        self.ttl = 60
+
+    def init_app(self, app):
+        """ integrate with app factory
+        """
+        self.cache = LRUCache(app.config['POSTS_DETAIL_CACHE_BYTES'], weigh=lambda entry: sizeof(entry[0]))
+        self.ttl = app.config['POSTS_DETAIL_CACHE_TTL']
+
+    @staticmethod
+    def generation():
+        """ generation of the page cache, None if it's disabled
+        """
+        return page_cache.generation() if page_cache.enabled else None
+
+    def cached(self, post_uuid, generation=None):
+        """ given post as dict if cached and current, without querying the database
+            - shared by readers, don't modify
+        """
+        entry = self.cache.get(uuid.UUID(post_uuid).hex)
+        if entry is None:
+            return None
+
+        post, tagged = entry
+        current = self.generation() if (generation is None) else generation
+
+        return post if (tagged == current) else None
+
+    def get(self, post_uuid):
+        """ given post as dict, None if there is no such post
+            - shared by readers, don't modify
+        """
+        # read before loading, so writes committed meanwhile leave the entry outdated:
+        generation = self.generation()
+
+        post = self.cached(post_uuid, generation)
+        if post is None:
+            key = uuid.UUID(post_uuid).hex
+            post = self.load(key)
+            if not (post is None):
+                self.cache.set(key, (post, generation), time.time() + self.ttl)
+
+        return post
+
+    @staticmethod
+    def version(post_uuid):
+        """ validators of given post, None if there is no such post
+            - for misses, to answer conditional requests without loading the contents
+        """
+        from application.auth.v2.models import DelegatedUser
+        from application.models import Post
+
+        post = db.session.query(
+            Post.uuid,
+            DelegatedUser.nickname.label("author"),
+            Post.timestamp
+        ).outerjoin(
+            DelegatedUser, Post.author_id == DelegatedUser.id
+        ).filter(
+            Post.uuid == uuid.UUID(post_uuid)
+        ).first()
+
+        if post is None:
+            return None
+
+        return {
+            "id": post.uuid.hex,
+            "author": post.author,
+            "timestamp": post.timestamp
+        }
+
+    @staticmethod
+    def load(key):
+        """ given post from the database
+        """
+        from application.auth.v2.models import DelegatedUser
+        from application.models import Post
+
+        post = db.session.query(
+            Post.uuid,
+            Post.title,
+            Post.author_id,
+            DelegatedUser.nickname.label("author"),
+            Post.timestamp,
+            Post.contents,
+            Post.contents_html
+        ).outerjoin(
+            DelegatedUser, Post.author_id == DelegatedUser.id
+        ).filter(
+            Post.uuid == uuid.UUID(key)
+        ).first()
+
+        if post is None:
+            return None
+
+        return {
+            "id": post.uuid.hex,
+            "title": post.title,
+            "author_id": post.author_id,
+            "author": post.author,
+            "timestamp": post.timestamp,
+            "contents": post.contents,
+            # rendered on demand until deferred render is done:
+            "contents_html": renderer.html(post.contents, post.contents_html)
+        }
+
+    def invalidate(self, keys):
+        """ drop given posts
+        """
+        for key in keys:
+            self.cache.delete(key)
+
+post_cache = PostCache()
+
+#----------------------------------------------------------------------------#
+# invalidation on post writes
+#----------------------------------------------------------------------------#
+# session.info key of the uuids of flushed posts, True once all posts are stale:
+STALE_POSTS = 'stale_posts'
+
+@db.event.listens_for(db.session, 'after_flush')
+def collect_stale_posts(session, flush_context):
+    from application.auth.v2.models import DelegatedUser
+    from application.models import Post
+
+    stale = session.info.setdefault(STALE_POSTS, set())
+    if stale is True:
+        return
+
+    for post in list(session.dirty) + list(session.deleted):
+        if isinstance(post, Post):
+            stale.add(post.uuid.hex)
+        # author nicknames are cached along with posts:
+        elif isinstance(post, DelegatedUser) and inspect(post).attrs.nickname.history.has_changes():
+            session.info[STALE_POSTS] = True
+            return
+
+@db.event.listens_for(db.session, 'after_commit')
+def drop_stale_posts(session):
+    stale = session.info.pop(STALE_POSTS, None)
+    if stale is True:
+        post_cache.cache.clear()
+    elif stale:
+        post_cache.invalidate(stale)
+
+@db.event.listens_for(db.session, 'after_soft_rollback')
+def discard_stale_posts(session, previous_transaction):
+    session.info.pop(STALE_POSTS, None)
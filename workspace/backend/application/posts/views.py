@@ -1,7 +1,12 @@
 from application import db
 import uuid
 from application.auth.v2.models import DelegatedUser
+from application.http_cache import conditional, make_page_etag, validate
 from application.models import Post
+from application.page_cache import page_cache
+from application.post_cache import post_cache
+from application.pagination import KeysetPagination
+from application.timeline import timeline
 
 from flask import current_app
 from flask import session
@@ -32,25 +37,17 @@ def create_post():
 
         if form.validate():        
             try:
-                # create new post id:
-                if Post.query.count() == 0:
-                    id = 1
-                else:
-                    from sqlalchemy.sql import func
-                    post_id_summary = db.session.query(
-                        func.max(Post.id).label("max")
-                    ).one()
-                    id = post_id_summary.max + 1
-                
-                # create new post:
+                # create new post, id is allocated by database:
                 post = Post(
-                    id = id,
                     title = form.title.data,
                     contents = form.contents.data,
                     author_id = session[Session.ID]
                 )
                 # insert:
                 db.session.add(post)
+                db.session.flush()
+                # fan out to followers:
+                timeline.on_post_created(post)
                 # commit:
                 db.session.commit()
                 
@@ -73,86 +70,134 @@ def create_post():
 #  READ
 #  ----------------------------------------------------------------
 @bp.route('/', methods=['GET'])
+@conditional
 def posts():
     """ show all posts
     """
-    # parse query parameter page:
-    page = request.args.get('page', 1, type=int)
-
-    # data:
-    user_subq = DelegatedUser.query.with_entities(
-        DelegatedUser.id,
-        DelegatedUser.nickname
-    ).subquery()
-
-    # generate pagination:
-    pagination = Post.query.with_entities(
-        Post.uuid,
-        Post.title,
-        user_subq.c.nickname.label("author"),
-        Post.timestamp
-    ).join(
-        user_subq, Post.author_id == user_subq.c.id
-    ).order_by(
-        Post.timestamp.desc()
-    ).paginate(
-        page, per_page=current_app.config['POSTS_PER_PAGE'],
-        error_out=False
+    # validators, the page is identified by its cursor or number:
+    cursor = ('after', request.args['after']) if ('after' in request.args) else \
+        ('page', request.args.get('page', 1, type=int))
+    headers = validate(
+        make_page_etag(Post.listing_version(), *cursor, current_app.config['POSTS_PER_PAGE'])
     )
-    posts = pagination.items
+
+    def render():
+        # data:
+        user_subq = DelegatedUser.query.with_entities(
+            DelegatedUser.id,
+            DelegatedUser.nickname
+        ).subquery()
+
+        query = Post.query.with_entities(
+            Post.id,
+            Post.uuid,
+            Post.title,
+            user_subq.c.nickname.label("author"),
+            Post.timestamp
+        ).join(
+            user_subq, Post.author_id == user_subq.c.id
+        )
+
+        # keyset pagination, opted in by query parameter after:
+        if 'after' in request.args:
+            try:
+                keyset = KeysetPagination(
+                    query, Post.timestamp, Post.id,
+                    after=request.args['after'],
+                    per_page=current_app.config['POSTS_PER_PAGE']
+                )
+            except ValueError as e:
+                abort(400, description=str(e))
+            pagination = None
+            next_cursor = keyset.next_cursor
+            posts = keyset.items
+        # offset pagination:
+        else:
+            # parse query parameter page:
+            page = request.args.get('page', 1, type=int)
+
+            # generate pagination:
+            pagination = query.order_by(
+                Post.timestamp.desc()
+            ).paginate(
+                page, per_page=current_app.config['POSTS_PER_PAGE'],
+                error_out=False
+            )
+            next_cursor = None
+            posts = pagination.items
     
-    # format:
-    posts=[
-        {
-            "id": id.hex,
-            "title": title,
-            "author": author,
-            "timestamp": timestamp,
-        } for (id, title, author, timestamp) in posts
-    ]
+        # format:
+        posts=[
+            {
+                "id": post.uuid.hex,
+                "title": post.title,
+                "author": post.author,
+                "timestamp": post.timestamp,
+            } for post in posts
+        ]
     
-    return render_template('posts/pages/posts.html', posts=posts, pagination=pagination)
+        return render_template('posts/pages/posts.html', posts=posts, pagination=pagination, next_cursor=next_cursor)
+
+    # anonymous visitors share the first pages, read from page cache:
+    anonymous = not (Session.TOKEN in session) and not ('_flashes' in session)
+    if page_cache.enabled and anonymous and cursor[0] == 'page' and 1 <= cursor[1] <= page_cache.max_pages:
+        html = page_cache.get_or_render(
+            'posts', (current_app.config['HTTP_ETAG_VERSION'], *cursor, current_app.config['POSTS_PER_PAGE']),
+            render
+        )
+    else:
+        html = render()
+
+    return html, 200, headers
+
+@bp.route('/feed', methods=['GET'])
+@requires_auth
+def feed():
+    """ show posts of followed users
+    """
+    try:
+        posts, next_cursor = timeline.read(
+            session[Session.ID],
+            after=request.args.get('after', ''),
+            per_page=current_app.config['POSTS_PER_PAGE']
+        )
+    except ValueError as e:
+        abort(400, description=str(e))
+
+    return render_template('posts/pages/posts.html', posts=posts, pagination=None, next_cursor=next_cursor)
 
 @bp.route('/<post_uuid>')
 @requires_auth
+@conditional
 def show_post(post_uuid):
     """ show given post
     """
-    # data:
-    user_subq = DelegatedUser.query.with_entities(
-        DelegatedUser.id,
-        DelegatedUser.nickname
-    ).subquery()
-
-    post = Post.query.with_entities(
-        Post.uuid,
-        Post.title,
-        user_subq.c.nickname.label("author"),
-        Post.timestamp,
-        Post.contents,
-        Post.contents_html
-    ).filter(
-        Post.uuid == uuid.UUID(post_uuid)
-    ).join(
-        user_subq, Post.author_id == user_subq.c.id
-    ).first()
+    # cached post, else validators checked before the contents are loaded:
+    post = post_cache.cached(post_uuid)
+    version = post_cache.version(post_uuid) if (post is None) else post
 
-    if post is None:
+    if version is None:
         abort(
             404, 
             description='There is no post with id={}'.format(post_uuid)
         )
 
-    post = {
-        "id": post.uuid.hex,
-        "title": post.title,
-        "author": post.author,
-        "timestamp": post.timestamp,
-        "contents": post.contents,
-        "contents_html": post.contents_html
-    }
+    headers = validate(
+        make_page_etag(version['id'], version['author'], version['timestamp']), 
+        last_modified = version['timestamp']
+    )
+
+    # data, read through post detail cache:
+    if post is None:
+        post = post_cache.get(post_uuid)
+
+    if post is None:
+        abort(
+            404, 
+            description='There is no post with id={}'.format(post_uuid)
+        )
 
-    return render_template('posts/pages/post.html', post=post)
+    return render_template('posts/pages/post.html', post=post), 200, headers
 
 #  UPDATE
 #  ----------------------------------------------------------------
@@ -0,0 +1,293 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from sqlalchemy import text
+
+from application import db
+from application.cache import LRUCache
+
+# html tag whitelist:
+ALLOWED_TAGS = [
+    'a', 
+    'abbr', 
+    'acronym', 
+    'b', 
+    'blockquote', 
+    'code',
+    'em', 
+    'i', 
+    'li', 
+    'ol', 
+    'pre', 
+    'strong', 
+    'ul',
+    'h1', 'h2', 'h3', 
+    'p'
+]
+
+# bump whenever the renderer or the tag whitelist changes:
+RENDER_VERSION = 1
+
+def render(contents):
+    """ render markdown contents into sanitized html
+    """
+    # imported on first render, most requests only serve rendered html:
+    from markdown import markdown
+    import bleach
+
+    return bleach.linkify(
+        bleach.clean(
+            markdown(contents, output_format='html'),
+            tags=ALLOWED_TAGS, 
+            strip=True
+        )
+    )
+
+def render_key(contents):
+    """ cache key of rendered contents, changes with the renderer and the tag whitelist
+    """
+    digest = hashlib.sha256()
+    for part in (str(RENDER_VERSION), ','.join(ALLOWED_TAGS), contents):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+
+    return digest.hexdigest()
+
+
+class RenderCache:
+    """ rendered html keyed by content hash
+        - bounded in-memory LRU tier, shared by all threads of the worker
+        - optional file tier under directory, shared by workers and restarts
+    """
+    def __init__(self, capacity=1024, directory=None):
+        self.directory = directory
+
+        self._memory = LRUCache(capacity)
+        # stats:
+        self._file_hits = 0
+        self._renders = 0
+        self._render_time = 0.0
+        self._lock = threading.Lock()
+
+    def render(self, contents):
+        """ rendered contents, from cache if possible
+        """
+        key = render_key(contents)
+
+        html = self._memory.get(key)
+        if html is None:
+            html = self._read(key)
+            if html is None:
+                start = time.perf_counter()
+                html = render(contents)
+                self._count_render(time.perf_counter() - start)
+
+                self._write(key, html)
+            else:
+                with self._lock:
+                    self._file_hits += 1
+
+            self._memory.set(key, html)
+
+        return html
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f'{key}.html')
+
+    def _read(self, key):
+        if self.directory is None:
+            return None
+
+        try:
+            with open(self._path(key), encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write(self, key, html):
+        if self.directory is None:
+            return
+
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # atomic, readers never see partial files:
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(html)
+            os.replace(temp_path, path)
+        except OSError:
+            # the file tier is best effort:
+            pass
+
+    def _count_render(self, render_time):
+        with self._lock:
+            self._renders += 1
+            self._render_time += render_time
+
+    def clear(self):
+        """ drop in-memory entries and reset stats
+        """
+        self._memory.clear()
+        with self._lock:
+            self._file_hits = 0
+            self._renders = 0
+            self._render_time = 0.0
+
+    @property
+    def stats(self):
+        """ hit rates and render time, in seconds
+        """
+        memory = self._memory.stats
+        lookups = memory['hits'] + memory['misses']
+
+        with self._lock:
+            return {
+                "size": memory['size'],
+                "capacity": memory['capacity'],
+                "memory_hits": memory['hits'],
+                "file_hits": self._file_hits,
+                "renders": self._renders,
+                "hit_rate": ((lookups - self._renders) / lookups) if lookups else 0.0,
+                "render_time": self._render_time,
+                "avg_render_time": (self._render_time / self._renders) if self._renders else 0.0
+            }
+
+
+class Renderer:
+    """ renders Post.contents into Post.contents_html
+        - sync: on contents set, inside the request
+        - deferred: contents_html is cleared on contents set and rendered by a worker pool
+          once the transaction commits. readers fall back to render on demand meanwhile
+    """
+    MODES = ('sync', 'deferred')
+
+    def __init__(self):
+        self.mode = 'sync'
+
+        self.cache = RenderCache()
+
+        self._app = None
+        self._executor = None
+
+    def init_app(self, app):
+        """ integrate with app factory
+        """
+        mode = app.config['POSTS_RENDER_MODE']
+        if not (mode in Renderer.MODES):
+            raise ValueError(f'Unknown render mode {mode}')
+
+        self.mode = mode
+        self.cache = RenderCache(
+            capacity = app.config['POSTS_RENDER_CACHE_SIZE'],
+            directory = app.config['POSTS_RENDER_CACHE_DIR']
+        )
+        self._app = app
+        self._executor = ThreadPoolExecutor(
+            max_workers = app.config['POSTS_RENDER_WORKERS']
+        )
+
+    @property
+    def deferred(self):
+        return self.mode == 'deferred'
+
+    def on_contents_set(self, post, contents, old_contents=None):
+        """ render or schedule rendering of newly set post contents
+        """
+        # unchanged contents, e.g. a retitled post, keep their html:
+        if (contents == old_contents) and not (post.contents_html is None):
+            return
+
+        if self.deferred:
+            post.contents_html = None
+            post.render_version = None
+            post.rendered_at = None
+        else:
+            post.contents_html = self.cache.render(contents)
+            post.render_version = RENDER_VERSION
+            post.rendered_at = datetime.utcnow()
+
+    def html(self, contents, contents_html):
+        """ html of post, rendered on demand if not ready yet
+        """
+        return self.cache.render(contents) if (contents_html is None) else contents_html
+
+    def submit(self, post_ids):
+        """ render given posts in the background
+        """
+        if post_ids:
+            self._executor.submit(self._render_posts, sorted(post_ids))
+
+    def _render_posts(self, post_ids):
+        with self._app.app_context():
+            try:
+                rows = db.session.execute(
+                    text(
+                        """
+                        SELECT id, contents FROM posts
+                        WHERE id IN :post_ids AND contents_html IS NULL
+                        """
+                    ),
+                    {"post_ids": tuple(post_ids)}
+                ).fetchall()
+
+                for (post_id, contents) in rows:
+                    # skip posts edited meanwhile, their own render is scheduled:
+                    db.session.execute(
+                        text(
+                            """
+                            UPDATE posts
+                            SET contents_html = :contents_html,
+                                render_version = :render_version,
+                                rendered_at = :rendered_at
+                            WHERE id = :post_id AND contents = :contents
+                            """
+                        ),
+                        {
+                            "post_id": post_id,
+                            "contents": contents,
+                            "contents_html": self.cache.render(contents),
+                            "render_version": RENDER_VERSION,
+                            "rendered_at": datetime.utcnow()
+                        }
+                    )
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                self._app.logger.exception(f'Failed to render posts {post_ids}')
+            finally:
+                db.session.remove()
+
+renderer = Renderer()
+
+#----------------------------------------------------------------------------#
+# deferred rendering, scheduled once the transaction commits
+#----------------------------------------------------------------------------#
+# ids of flushed posts waiting for render:
+PENDING_RENDERS = 'pending_renders'
+
+@db.event.listens_for(db.session, 'after_flush')
+def collect_pending_renders(session, flush_context):
+    if not renderer.deferred:
+        return
+
+    from application.models import Post
+
+    # ids are allocated by now, while they can't be loaded after commit:
+    pending = session.info.setdefault(PENDING_RENDERS, set())
+    for post in list(session.new) + list(session.dirty):
+        if isinstance(post, Post) and (post.contents_html is None):
+            pending.add(post.id)
+
+@db.event.listens_for(db.session, 'after_commit')
+def submit_pending_renders(session):
+    renderer.submit(session.info.pop(PENDING_RENDERS, None))
+
+@db.event.listens_for(db.session, 'after_soft_rollback')
+def discard_pending_renders(session, previous_transaction):
+    session.info.pop(PENDING_RENDERS, None)
@@ -0,0 +1,282 @@
+import hashlib
+import secrets
+import threading
+from datetime import datetime, timedelta
+
+from flask import session
+from flask.sessions import SessionInterface, SessionMixin, session_json_serializer
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from application import db
+
+#----------------------------------------------------------------------------#
+# stores
+#----------------------------------------------------------------------------#
+class MemorySessionStore:
+    """ in-process stand-in, sessions are neither shared by workers nor kept across restarts
+    """
+    def __init__(self):
+        # key -> (data, expires_at):
+        self._records = {}
+        self._lock = threading.Lock()
+
+    def load(self, key):
+        return self._records.get(key)
+
+    def save(self, key, data, expires_at):
+        with self._lock:
+            self._records[key] = (data, expires_at)
+
+    def touch(self, key, expires_at):
+        with self._lock:
+            if key in self._records:
+                self._records[key] = (self._records[key][0], expires_at)
+
+    def delete(self, key):
+        with self._lock:
+            self._records.pop(key, None)
+
+    def sweep(self, now, batch_size=1000):
+        with self._lock:
+            expired = [key for (key, (_, expires_at)) in self._records.items() if expires_at <= now]
+            for key in expired:
+                del self._records[key]
+
+        return len(expired)
+
+class SQLSessionStore:
+    """ sessions in table server_sessions
+        - on connections of their own, so saving a session never commits, nor is rolled back
+          with, the transaction of the view
+    """
+    def __init__(self):
+        from application.models import StoredSession
+
+        self.table = StoredSession.__table__
+
+    def load(self, key):
+        with db.engine.connect() as connection:
+            record = connection.execute(
+                select([self.table.c.data, self.table.c.expires_at]).where(self.table.c.id == key)
+            ).first()
+
+        return None if (record is None) else (record.data, record.expires_at)
+
+    def save(self, key, data, expires_at):
+        statement = insert(self.table).values(id = key, data = data, expires_at = expires_at)
+        with db.engine.begin() as connection:
+            connection.execute(
+                statement.on_conflict_do_update(
+                    index_elements = [self.table.c.id],
+                    set_ = {"data": statement.excluded.data, "expires_at": statement.excluded.expires_at}
+                )
+            )
+
+    def touch(self, key, expires_at):
+        with db.engine.begin() as connection:
+            connection.execute(
+                self.table.update().where(self.table.c.id == key).values(expires_at = expires_at)
+            )
+
+    def delete(self, key):
+        with db.engine.begin() as connection:
+            connection.execute(self.table.delete().where(self.table.c.id == key))
+
+    def sweep(self, now, batch_size=1000):
+        """ delete expired sessions, one short transaction per batch
+        """
+        count = 0
+        while True:
+            with db.engine.begin() as connection:
+                deleted = connection.execute(
+                    self.table.delete().where(
+                        self.table.c.id.in_(
+                            select([self.table.c.id]).where(
+                                self.table.c.expires_at <= now
+                            ).limit(batch_size)
+                        )
+                    )
+                ).rowcount
+            count += deleted
+
+            if deleted < batch_size:
+                return count
+
+#----------------------------------------------------------------------------#
+# sessions
+#----------------------------------------------------------------------------#
+def hash_sid(sid):
+    """ store key of given session id, a leaked store doesn't leak usable session ids
+    """
+    return hashlib.sha256(sid.encode('utf-8')).hexdigest()
+
+class ServerSession(SessionMixin):
+    """ session dict loaded from store on first access
+        - only the session id is kept in the cookie
+    """
+    def __init__(self, store, sid=None):
+        self.sid = sid
+        self.expires_at = None
+        # the id to delete once regenerated:
+        self.previous_sid = None
+
+        self.accessed = False
+        self.modified = False
+
+        self._store = store
+        self._data = None
+
+    @property
+    def loaded(self):
+        return not (self._data is None)
+
+    @property
+    def data(self):
+        if self._data is None:
+            self.accessed = True
+            self._data = self._load()
+
+        return self._data
+
+    def _load(self):
+        record = None if (self.sid is None) else self._store.load(hash_sid(self.sid))
+
+        if (record is None) or (record[1] <= datetime.utcnow()):
+            # unknown ids are never adopted, a new one is issued on save:
+            self.sid = None
+            return {}
+
+        data, self.expires_at = record
+
+        return session_json_serializer.loads(data)
+
+    def regenerate(self):
+        """ issue a new session id on save, e.g. on login against session fixation
+        """
+        # load under the current id first:
+        self.data
+        if not (self.sid is None):
+            self.previous_sid = self.sid
+            self.sid = None
+        self.modified = True
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __setitem__(self, key, value):
+        self.data[key] = value
+        self.modified = True
+
+    def __delitem__(self, key):
+        del self.data[key]
+        self.modified = True
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+class ServerSessionInterface(SessionInterface):
+    """ flask session interface over given store
+        - sessions are written back only when modified
+        - idle sessions expire after idle_timeout, pushed back at most once per refresh_interval
+    """
+    def __init__(self, store, idle_timeout, refresh_interval):
+        self.store = store
+        self.idle_timeout = idle_timeout
+        self.refresh_interval = refresh_interval
+
+    def open_session(self, app, request):
+        return ServerSession(self.store, request.cookies.get(app.session_cookie_name))
+
+    def save_session(self, app, session, response):
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if not (session.previous_sid is None):
+            self.store.delete(hash_sid(session.previous_sid))
+
+        if not session.modified:
+            # keep active sessions alive:
+            now = datetime.utcnow()
+            if session.loaded and not (session.sid is None) and \
+                (session.expires_at - now) < (self.idle_timeout - self.refresh_interval):
+                self.store.touch(hash_sid(session.sid), now + self.idle_timeout)
+            return
+
+        if not session:
+            if not (session.sid is None):
+                self.store.delete(hash_sid(session.sid))
+                response.delete_cookie(app.session_cookie_name, domain = domain, path = path)
+            return
+
+        is_new = session.sid is None
+        if is_new:
+            session.sid = secrets.token_urlsafe(32)
+
+        self.store.save(
+            hash_sid(session.sid),
+            session_json_serializer.dumps(dict(session)),
+            datetime.utcnow() + self.idle_timeout
+        )
+
+        # the cookie only changes with the id, or its expiry for permanent sessions:
+        if is_new or session.permanent:
+            response.set_cookie(
+                app.session_cookie_name,
+                session.sid,
+                expires = self.get_expiration_time(app, session),
+                httponly = self.get_cookie_httponly(app),
+                domain = domain,
+                path = path,
+                secure = self.get_cookie_secure(app),
+                samesite = self.get_cookie_samesite(app)
+            )
+
+class ServerSessions:
+    """ server-side sessions, backed by table server_sessions or kept in memory
+    """
+    STORES = {
+        'sql': SQLSessionStore,
+        'memory': MemorySessionStore
+    }
+
+    def __init__(self):
+        self.store = None
+
+    def init_app(self, app):
+        """ integrate with app factory
+        """
+        backend = app.config['SESSION_BACKEND']
+        if not (backend in ServerSessions.STORES):
+            raise ValueError(f'Unknown session backend {backend}')
+
+        self.store = ServerSessions.STORES[backend]()
+        app.session_interface = ServerSessionInterface(
+            self.store,
+            idle_timeout = timedelta(seconds=app.config['SESSION_IDLE_TIMEOUT']),
+            refresh_interval = timedelta(seconds=app.config['SESSION_REFRESH_INTERVAL'])
+        )
+
+    @staticmethod
+    def skip_unloaded(app, hook):
+        """ run given after request hook only for requests that loaded the session
+            - for hooks which only peek into it, they would load every session
+        """
+        def lazy_hook(response):
+            return hook(response) if session.loaded else response
+
+        hooks = app.after_request_funcs.setdefault(None, [])
+        hooks[hooks.index(hook)] = lazy_hook
+
+    def sweep(self, batch_size=1000):
+        """ delete expired sessions, returns their count
+        """
+        return self.store.sweep(datetime.utcnow(), batch_size)
+
+server_sessions = ServerSessions()
@@ -0,0 +1,35 @@
+import os
+import resource
+
+from application import db
+
+# resident set size is reported in pages:
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+
+def resident_memory():
+    """ resident memory of current process, in MB
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * PAGE_SIZE / (1024 * 1024)
+    except OSError:
+        # no procfs, fall back to peak resident memory in KB:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def after_fork(app):
+    """ reset per-process state of an app preloaded before fork
+        - pooled database connections would be shared with the master and siblings
+        - Auth0 keep-alive connections likewise
+        - executor threads don't survive fork, recreate executors
+    """
+    from application.auth.v2.services import provider
+    from application.rendering import renderer
+    from application.users import profiles
+
+    with app.app_context():
+        db.engine.dispose()
+
+    provider.session.close()
+
+    renderer.init_app(app)
+    profiles.init_app(app)
@@ -0,0 +1,365 @@
+import bisect
+import random
+import threading
+
+from sqlalchemy import tuple_, text
+
+from application import db
+from application.models import Post, Follow, TimelineEntry
+from application.auth.v2.models import DelegatedUser
+from application.pagination import encode_cursor, decode_cursor
+
+#----------------------------------------------------------------------------#
+# timeline stores
+#----------------------------------------------------------------------------#
+class SQLTimelineStore:
+    """ timelines materialized in table timeline_entries
+    """
+    def __init__(self, max_entries, trim_interval):
+        self.max_entries = max_entries
+        self.trim_interval = trim_interval
+
+    def push(self, author_id, post_id, timestamp):
+        """ insert post into the timelines of all followers of its author
+        """
+        db.session.execute(
+            text(
+                """
+                INSERT INTO timeline_entries (user_id, post_id, timestamp)
+                SELECT follower_id, :post_id, :timestamp
+                FROM follows
+                WHERE followed_id = :author_id
+                ON CONFLICT DO NOTHING
+                """
+            ),
+            {
+                "author_id": author_id,
+                "post_id": post_id,
+                "timestamp": timestamp
+            }
+        )
+
+        # every push grows each follower's timeline by one entry, so trimming
+        # once every trim_interval pushes keeps them within max_entries + trim_interval:
+        if random.randrange(self.trim_interval) == 0:
+            self.trim(author_id)
+
+    def trim(self, author_id):
+        """ keep only the newest max_entries in the timelines of the author's followers
+        """
+        db.session.execute(
+            text(
+                """
+                DELETE FROM timeline_entries AS t
+                USING follows AS f, LATERAL (
+                    SELECT e.timestamp, e.post_id
+                    FROM timeline_entries AS e
+                    WHERE e.user_id = f.follower_id
+                    ORDER BY e.timestamp DESC, e.post_id DESC
+                    OFFSET :max_entries LIMIT 1
+                ) AS horizon
+                WHERE f.followed_id = :author_id
+                  AND t.user_id = f.follower_id
+                  AND (t.timestamp, t.post_id) <= (horizon.timestamp, horizon.post_id)
+                """
+            ),
+            {
+                "author_id": author_id,
+                "max_entries": self.max_entries
+            }
+        )
+
+    def remove(self, user_id, author_id):
+        """ delete posts of author from user's timeline, e.g. on unfollow
+        """
+        db.session.execute(
+            text(
+                """
+                DELETE FROM timeline_entries AS t
+                USING posts AS p
+                WHERE t.user_id = :user_id
+                  AND p.id = t.post_id
+                  AND p.author_id = :author_id
+                """
+            ),
+            {
+                "user_id": user_id,
+                "author_id": author_id
+            }
+        )
+
+    def rebuild(self, max_followers):
+        """ materialize all timelines from follows and posts, e.g. after bulk loads
+        """
+        db.session.execute(text('TRUNCATE timeline_entries'))
+        db.session.execute(
+            text(
+                """
+                INSERT INTO timeline_entries (user_id, post_id, timestamp)
+                SELECT user_id, post_id, timestamp
+                FROM (
+                    SELECT
+                        f.follower_id AS user_id, 
+                        p.id AS post_id, 
+                        p.timestamp,
+                        row_number() OVER (
+                            PARTITION BY f.follower_id 
+                            ORDER BY p.timestamp DESC, p.id DESC
+                        ) AS rank
+                    FROM follows AS f
+                    JOIN delegated_users AS u ON u.id = f.followed_id
+                    JOIN posts AS p ON p.author_id = f.followed_id
+                    WHERE u.num_followers <= :max_followers
+                ) AS entries
+                WHERE rank <= :max_entries
+                """
+            ),
+            {
+                "max_followers": max_followers,
+                "max_entries": self.max_entries
+            }
+        )
+
+    def read(self, user_id, before, limit):
+        """ newest (timestamp, post_id) entries of user's timeline older than before
+        """
+        query = db.session.query(
+            TimelineEntry.timestamp,
+            TimelineEntry.post_id
+        ).filter(
+            TimelineEntry.user_id == user_id
+        )
+
+        if not (before is None):
+            query = query.filter(
+                tuple_(TimelineEntry.timestamp, TimelineEntry.post_id) < tuple_(*before)
+            )
+
+        return query.order_by(
+            TimelineEntry.timestamp.desc(),
+            TimelineEntry.post_id.desc()
+        ).limit(
+            limit
+        ).all()
+
+class MemoryTimelineStore:
+    """ in-process stand-in for a key-value timeline store, e.g. Redis sorted sets
+        - timelines are lost on restart and not shared between workers
+    """
+    def __init__(self, max_entries, trim_interval):
+        self.max_entries = max_entries
+
+        # user id -> ascending [(timestamp, post_id)]:
+        self._timelines = {}
+        self._lock = threading.Lock()
+
+    def push(self, author_id, post_id, timestamp):
+        """ insert post into the timelines of all followers of its author
+        """
+        follower_ids = [
+            follower_id for (follower_id, ) in Follow.query.with_entities(
+                Follow.follower_id
+            ).filter(
+                Follow.followed_id == author_id
+            )
+        ]
+
+        with self._lock:
+            for follower_id in follower_ids:
+                timeline = self._timelines.setdefault(follower_id, [])
+                bisect.insort(timeline, (timestamp, post_id))
+                # trim:
+                del timeline[:-self.max_entries]
+
+    def remove(self, user_id, author_id):
+        """ delete posts of author from user's timeline, e.g. on unfollow
+        """
+        with self._lock:
+            post_ids = [post_id for (_, post_id) in self._timelines.get(user_id, [])]
+        if not post_ids:
+            return
+
+        removed = {
+            post_id for (post_id, ) in Post.query.with_entities(
+                Post.id
+            ).filter(
+                Post.id.in_(post_ids),
+                Post.author_id == author_id
+            )
+        }
+
+        with self._lock:
+            timeline = self._timelines.get(user_id, [])
+            timeline[:] = [entry for entry in timeline if not (entry[1] in removed)]
+
+    def read(self, user_id, before, limit):
+        """ newest (timestamp, post_id) entries of user's timeline older than before
+        """
+        with self._lock:
+            timeline = self._timelines.get(user_id, [])
+            end = len(timeline) if (before is None) else bisect.bisect_left(timeline, tuple(before))
+
+            return timeline[max(end - limit, 0):end][::-1]
+
+    def rebuild(self, max_followers):
+        """ drop all timelines, the fan-out-on-read fallback serves older posts
+        """
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._timelines.clear()
+
+#----------------------------------------------------------------------------#
+# timeline service
+#----------------------------------------------------------------------------#
+class Timeline:
+    """ home timeline -- posts of followed authors, newest first
+        - fan-out-on-write: a new post is pushed into the timeline of each follower
+        - fan-out-on-read: posts of authors with more than fanout_max_followers
+          followers are merged in at read time, as are posts older than the
+          materialized part of a timeline
+    """
+    BACKENDS = {
+        'sql': SQLTimelineStore,
+        'memory': MemoryTimelineStore
+    }
+
+    def __init__(self):
+        self.store = None
+        self.fanout_max_followers = None
+
+    def init_app(self, app):
+        """ integrate with app factory
+        """
+        self.store = Timeline.BACKENDS[app.config['TIMELINE_BACKEND']](
+            max_entries = app.config['TIMELINE_MAX_ENTRIES'],
+            trim_interval = app.config['TIMELINE_TRIM_INTERVAL']
+        )
+        self.fanout_max_followers = app.config['TIMELINE_FANOUT_MAX_FOLLOWERS']
+
+    def on_post_created(self, post):
+        """ fan out newly flushed post to followers of its author
+        """
+        num_followers = db.session.query(
+            DelegatedUser.num_followers
+        ).filter(
+            DelegatedUser.id == post.author_id
+        ).scalar()
+
+        if not (num_followers is None) and num_followers <= self.fanout_max_followers:
+            self.store.push(post.author_id, post.id, post.timestamp)
+
+    def on_unfollow(self, user_id, author_id):
+        """ drop posts of unfollowed author from user's materialized timeline
+            - call in the transaction deleting the follow
+        """
+        self.store.remove(user_id, author_id)
+
+    def rebuild(self):
+        """ materialize all timelines from follows and posts, e.g. after bulk loads
+        """
+        self.store.rebuild(self.fanout_max_followers)
+
+    def _pull(self, authors, before, limit):
+        """ fan-out-on-read: newest (timestamp, post_id) of given authors older than before
+        """
+        query = db.session.query(
+            Post.timestamp,
+            Post.id
+        ).filter(
+            Post.author_id.in_(authors)
+        )
+
+        if not (before is None):
+            query = query.filter(
+                tuple_(Post.timestamp, Post.id) < tuple_(*before)
+            )
+
+        return query.order_by(
+            Post.timestamp.desc(),
+            Post.id.desc()
+        ).limit(
+            limit
+        ).all()
+
+    def read(self, user_id, after, per_page):
+        """ one page of user's home timeline
+            - after: cursor of the last post on previous page, empty for the first page
+            - return (posts, next cursor)
+            - raise ValueError for malformed cursor
+        """
+        before = decode_cursor(after) if after else None
+        limit = per_page + 1
+
+        followed = db.session.query(
+            Follow.followed_id
+        ).filter(
+            Follow.follower_id == user_id
+        )
+
+        # materialized:
+        entries = [tuple(entry) for entry in self.store.read(user_id, before, limit)]
+        # authors not fanned out on write:
+        candidates = entries + [
+            tuple(entry) for entry in self._pull(
+                followed.join(
+                    DelegatedUser, DelegatedUser.id == Follow.followed_id
+                ).filter(
+                    DelegatedUser.num_followers > self.fanout_max_followers
+                ),
+                before, limit
+            )
+        ]
+        # beyond the materialized part, e.g. trimmed or followed after posting:
+        if len(entries) < limit:
+            horizon = entries[-1] if entries else before
+            candidates += [
+                tuple(entry) for entry in self._pull(followed, horizon, limit)
+            ]
+
+        # merge, newest first:
+        keys, post_ids = [], set()
+        for (timestamp, post_id) in sorted(candidates, reverse=True):
+            if not (post_id in post_ids):
+                post_ids.add(post_id)
+                keys.append((timestamp, post_id))
+        keys = keys[:limit]
+
+        next_cursor = None
+        if len(keys) > per_page:
+            keys = keys[:per_page]
+            next_cursor = encode_cursor(*keys[-1])
+
+        return self._load([post_id for (_, post_id) in keys]), next_cursor
+
+    def _load(self, post_ids):
+        """ brief posts in given order
+        """
+        if not post_ids:
+            return []
+
+        rows = db.session.query(
+            Post.id,
+            Post.uuid,
+            Post.title,
+            DelegatedUser.nickname.label('author'),
+            Post.timestamp
+        ).join(
+            DelegatedUser, Post.author_id == DelegatedUser.id
+        ).filter(
+            Post.id.in_(post_ids)
+        ).all()
+        rows = {row.id: row for row in rows}
+
+        # format, skipping posts deleted meanwhile:
+        return [
+            {
+                "id": rows[post_id].uuid.hex,
+                "title": rows[post_id].title,
+                "author": rows[post_id].author,
+                "timestamp": rows[post_id].timestamp,
+            } for post_id in post_ids if post_id in rows
+        ]
+
+timeline = Timeline()
@@ -7,4 +7,12 @@ from application.auth.v2.services import UserByEmail, Users
 service_user_by_email = UserByEmail()
 service_user_management = Users()
 
-from . import views
\ No newline at end of file
+from .profiles import ProfileCache
+
+profiles = ProfileCache(service_user_by_email)
+
+@bp.record_once
+def init_profiles(state):
+    profiles.init_app(state.app)
+
+from . import views
@@ -0,0 +1,202 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy.dialects.postgresql import insert
+
+from application import db
+from application.bulk import batched
+from application.auth.v2.models import DelegatedUser
+from application.models import Post, SyncWatermark
+
+# Auth0 timestamp format:
+AUTH0_TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+
+def parse_timestamp(value):
+    """ parse Auth0 timestamp, None if absent
+    """
+    return None if (value is None) else datetime.strptime(value, AUTH0_TIMESTAMP_FORMAT)
+
+def format_timestamp(value):
+    """ format Auth0 timestamp, in milliseconds
+    """
+    return value.strftime(AUTH0_TIMESTAMP_FORMAT)[:-4] + 'Z'
+
+
+class ProfileCache:
+    """ Auth0 user profiles cached in table delegated_users
+        - fresh profiles are served without calling Auth0
+        - stale profiles are served as they are and refreshed in the background
+        - profiles never synced are fetched synchronously
+    """
+    # watermark of user syncs, the newest Auth0 updated_at synced:
+    SYNC_WATERMARK = 'auth0_users'
+
+    def __init__(self, service):
+        # Auth0 users-by-email service:
+        self.service = service
+        self.ttl = timedelta(seconds=600)
+
+        self._app = None
+        self._executor = None
+        # ids of users being refreshed:
+        self._in_flight = set()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """ integrate with app factory
+        """
+        self._app = app
+        self.ttl = timedelta(seconds=app.config['AUTH0_PROFILE_TTL'])
+        self._executor = ThreadPoolExecutor(
+            max_workers = app.config['AUTH0_PROFILE_REFRESH_WORKERS']
+        )
+
+    def load(self, user):
+        """ make sure profile of given user is cached, refreshing it when stale
+        """
+        if user.profile_synced_at is None:
+            self.refresh(user)
+        elif datetime.utcnow() - user.profile_synced_at > self.ttl:
+            self._refresh_in_background(user.id)
+
+        return user
+
+    def refresh(self, user):
+        """ fetch profile of given user from Auth0
+        """
+        userinfo = self.service.get(user.email)[0]
+        self.store(user, userinfo)
+        db.session.commit()
+
+    @staticmethod
+    def store(user, userinfo):
+        """ cache Auth0 user info, e.g. from a users-by-email or users patch response
+        """
+        metadata = userinfo.get('user_metadata', {})
+
+        user.nickname = userinfo['nickname']
+        user.location = metadata.get('location', '')
+        user.about_me = metadata.get('about_me', '')
+        user.profile_updated_at = parse_timestamp(userinfo.get('updated_at'))
+        user.last_login = parse_timestamp(userinfo.get('last_login'))
+        user.profile_synced_at = datetime.utcnow()
+
+        db.session.add(user)
+
+    @staticmethod
+    def store_many(userinfos, batch_size=1000, changed_only=False):
+        """ upsert Auth0 user infos in bulk, e.g. from a users listing
+            - changed_only: skip cached users whose Auth0 updated_at is unchanged
+            - return the number of inserted or updated users
+        """
+        synced_at = datetime.utcnow()
+        rows = []
+        for userinfo in userinfos:
+            metadata = userinfo.get('user_metadata', {})
+            # local ids are Auth0 ids without provider prefix:
+            _, id = userinfo['user_id'].split('|')
+
+            rows.append(
+                {
+                    'id': id,
+                    'email': userinfo.get('email'),
+                    'nickname': userinfo['nickname'],
+                    'location': metadata.get('location', ''),
+                    'about_me': metadata.get('about_me', ''),
+                    'profile_updated_at': parse_timestamp(userinfo.get('updated_at')),
+                    'last_login': parse_timestamp(userinfo.get('last_login')),
+                    'profile_synced_at': synced_at
+                }
+            )
+
+        # one multi-row statement per batch, counters are left as they are:
+        count = 0
+        for batch in batched(rows, batch_size):
+            statement = insert(DelegatedUser).values(batch)
+            count += db.session.execute(
+                statement.on_conflict_do_update(
+                    index_elements = [DelegatedUser.id],
+                    set_ = {
+                        column: statement.excluded[column] for column in batch[0] if column != 'id'
+                    },
+                    where = DelegatedUser.profile_updated_at.is_distinct_from(
+                        statement.excluded.profile_updated_at
+                    ) if changed_only else None
+                )
+            ).rowcount
+
+        # upserted nicknames may be listed along with posts:
+        if count:
+            Post.mark_listing_changed()
+
+        return count
+
+    @staticmethod
+    def sync(service, overlap=timedelta(seconds=300), full=False, batch_size=1000):
+        """ mirror Auth0 users changed since last sync into delegated_users
+            - the first or a full sync lists all users, later ones search users
+              updated since the watermark, so a sync costs O(changes)
+            - search starts overlap before the watermark, for changes Auth0 indexes late
+            - users are listed oldest change first and the watermark is committed with
+              each listing, so listings capped by Auth0 continue where they stopped
+            - return (fetched, upserted)
+        """
+        watermark = None if full else SyncWatermark.get(ProfileCache.SYNC_WATERMARK)
+        since = None if (watermark is None) else watermark - overlap
+
+        fetched, upserted = 0, 0
+        while True:
+            params = {
+                'search_engine': 'v3',
+                'sort': 'updated_at:1'
+            }
+            if not (since is None):
+                params['q'] = f'updated_at:["{format_timestamp(since)}" TO *]'
+
+            users, total = service.get_all(params)
+            fetched += len(users)
+            upserted += ProfileCache.store_many(users, batch_size, changed_only=True)
+
+            newest = max(
+                [parse_timestamp(user['updated_at']) for user in users if user.get('updated_at')],
+                default = None
+            )
+            advanced = not (newest is None) and ((watermark is None) or newest > watermark)
+            if advanced:
+                watermark = newest
+                SyncWatermark.set(ProfileCache.SYNC_WATERMARK, watermark)
+            db.session.commit()
+
+            # more changes than one listing serves:
+            if advanced and len(users) < total:
+                since = watermark
+            else:
+                return fetched, upserted
+
+    def _refresh_in_background(self, user_id):
+        # at most one refresh per user at a time:
+        with self._lock:
+            if user_id in self._in_flight:
+                return
+            self._in_flight.add(user_id)
+
+        self._executor.submit(self._refresh_by_id, user_id)
+
+    def _refresh_by_id(self, user_id):
+        try:
+            with self._app.app_context():
+                try:
+                    user = DelegatedUser.query.get(user_id)
+                    if not (user is None):
+                        self.refresh(user)
+                except Exception:
+                    db.session.rollback()
+                    # keep serving the stale profile:
+                    self._app.logger.exception(f'Failed to refresh profile of user {user_id}')
+                finally:
+                    db.session.remove()
+        finally:
+            with self._lock:
+                self._in_flight.discard(user_id)
+
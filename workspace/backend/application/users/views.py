@@ -1,17 +1,15 @@
-from datetime import datetime
-
 from application import db
 from application.auth.v2.models import DelegatedUser
-from application.models import Follow, Post
+from application.models import Post
 
 from flask import current_app
 from flask import session
-from application.auth.v2.session import Session
+from application.auth.v2.session import Session, load_current_user
 from application.auth.v2.decorators import requires_auth
 from flask import abort, request, flash, render_template, redirect, url_for
 
 from . import bp
-from . import service_user_by_email, service_user_management
+from . import service_user_management, profiles
 from .forms import ProfileForm
 from application.auth.v2.models import DelegatedUser
 
@@ -25,34 +23,32 @@ from application.auth.v2.models import DelegatedUser
 def show_user(user_id):
     """ show user profile
     """
-    # fetch current user:
-    current_user = DelegatedUser.query.get(session[Session.ID])
+    # fetch current user, once per request:
+    current_user = load_current_user()
 
-    # fetch the specified user's profile from backend:
-    selected_user = DelegatedUser.query.filter(
-        DelegatedUser.id == user_id
-    ).first()
-    userinfo = service_user_by_email.get(selected_user.email)[0]
+    # fetch the specified user's profile, cached from backend:
+    selected_user = DelegatedUser.query.get_or_404(
+        user_id, 
+        description='There is no user with id={}'.format(user_id)
+    )
+    profiles.load(selected_user)
     
     # user profile display:
-    _, id = userinfo['user_id'].split('|')
+    id = selected_user.id
     user = {
         "id": id,
-        "nickname": userinfo["nickname"],
-        "location": userinfo["user_metadata"]["location"] if ("user_metadata" in userinfo and "location" in userinfo["user_metadata"]) else "",
-        "about_me": userinfo["user_metadata"]["about_me"] if ("user_metadata" in userinfo and "about_me" in userinfo["user_metadata"]) else "",
-        "last_updated": datetime.strptime(
-            userinfo["updated_at"], 
-            "%Y-%m-%dT%H:%M:%S.%fZ"
-        ),
-        "last_seen": datetime.strptime(
-            userinfo["last_login"], 
-            "%Y-%m-%dT%H:%M:%S.%fZ"
-        ),
+        "nickname": selected_user.nickname,
+        "location": selected_user.location or "",
+        "about_me": selected_user.about_me or "",
+        "last_updated": selected_user.profile_updated_at,
+        "last_seen": selected_user.last_login,
         "is_the_same_user": session[Session.ID] == user_id,
-        "is_following": current_user.is_following(selected_user),
-        "num_followers": Follow.query.filter(Follow.followed_id == user_id).count(),
-        "num_followed": Follow.query.filter(Follow.follower_id == user_id).count(),
+        "is_following": current_user.is_following(
+            selected_user, since=session.get(Session.FOLLOWS_CHANGED_AT)
+        ),
+        "num_followers": selected_user.num_followers,
+        "num_followed": selected_user.num_followed,
+        "num_posts": selected_user.num_posts,
     }
 
     # fetch latest posts:
@@ -117,9 +113,8 @@ def edit_user(user_id):
                         user_id, 
                         description='There is no user with id={}'.format(user_id)
                     )
-                    delegated_user.nickname = form.nickname.data
-                    # update:
-                    db.session.add(delegated_user)
+                    # update, writing through the profile cache:
+                    profiles.store(delegated_user, response)
                     # write
                     db.session.commit()
 
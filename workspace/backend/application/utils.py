@@ -6,6 +6,9 @@ import babel
 import logging
 from logging import Formatter, FileHandler
 
+from sqlalchemy.sql.expression import Executable, ClauseElement
+from sqlalchemy.ext.compiler import compiles
+
 
 def format_datetime(value, format='medium'):
     date = dateutil.parser.parse(value)
@@ -33,4 +36,17 @@ def convert_form_dict_to_dict(form_dict):
         key: (value[0] if len(value) == 1 else value) for key, value in form_dict.to_dict(flat=False).items()
     }
 
-    return json
\ No newline at end of file
+    return json
+
+class Explain(Executable, ClauseElement):
+    """ EXPLAIN of a query, executable with bound parameters
+    """
+    def __init__(self, query, analyze=False):
+        self.statement = getattr(query, 'statement', query)
+        self.analyze = analyze
+
+@compiles(Explain, 'postgresql')
+def compile_explain(element, compiler, **kwargs):
+    options = '(ANALYZE, BUFFERS) ' if element.analyze else ''
+
+    return f'EXPLAIN {options}{compiler.process(element.statement, **kwargs)}'
@@ -0,0 +1,65 @@
+""" gunicorn settings, driven by GUNICORN_* of the active config class
+    - gunicorn -c gunicorn.conf.py app:app
+    - worker model is picked by GUNICORN_WORKER_CLASS, 'gthread' or 'gevent'
+"""
+import os
+import sys
+
+# make config and application importable before gunicorn changes into this directory:
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# module level names are read as gunicorn settings, 'config' being one of them:
+from config import config as configs
+
+settings = configs[os.getenv('FLASK_CONFIG') or 'default']
+
+# gevent has to patch the standard library before the app is preloaded:
+if settings.GUNICORN_WORKER_CLASS == 'gevent':
+    from gevent import monkey
+    monkey.patch_all()
+    # make psycopg2 yield to other greenlets while waiting on Postgres:
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()
+
+from application.serving import after_fork, resident_memory
+
+# server socket:
+bind = settings.GUNICORN_BIND
+keepalive = settings.GUNICORN_KEEPALIVE
+
+# worker processes:
+worker_class = settings.GUNICORN_WORKER_CLASS
+workers = settings.GUNICORN_WORKERS
+# more than one thread turns any worker class into gthread:
+threads = settings.GUNICORN_THREADS if (worker_class == 'gthread') else 1
+worker_connections = settings.GUNICORN_WORKER_CONNECTIONS
+timeout = settings.GUNICORN_TIMEOUT
+graceful_timeout = settings.GUNICORN_GRACEFUL_TIMEOUT
+preload_app = settings.GUNICORN_PRELOAD
+
+# worker recycling:
+max_requests = settings.GUNICORN_MAX_REQUESTS
+max_requests_jitter = settings.GUNICORN_MAX_REQUESTS_JITTER
+
+# logging:
+accesslog = '-'
+errorlog = '-'
+
+#  server hooks
+#  ----------------------------------------------------------------
+def post_worker_init(worker):
+    """ reset state inherited from the master when the app was preloaded
+    """
+    if preload_app:
+        after_fork(worker.wsgi)
+
+def post_request(worker, req, environ, resp):
+    """ recycle worker gracefully once its memory grew beyond the limit
+    """
+    memory = resident_memory()
+    if worker.alive and memory > settings.GUNICORN_MAX_WORKER_MEMORY:
+        worker.log.info(
+            "Worker %s uses %.1f MB, over %s MB, recycling",
+            worker.pid, memory, settings.GUNICORN_MAX_WORKER_MEMORY
+        )
+        worker.alive = False
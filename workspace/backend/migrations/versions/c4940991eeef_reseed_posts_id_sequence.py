@@ -0,0 +1,31 @@
+"""reseed posts id sequence
+
+Post ids used to be allocated as max(id) + 1 by the application, so the
+serial sequence behind posts.id never advanced. Move it past existing rows
+so INSERT ... RETURNING id can take over.
+
+Revision ID: c4940991eeef
+Revises: d18da9a881e4
+Create Date: 2026-10-18 12:02:05.924322
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4940991eeef'
+down_revision = 'd18da9a881e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(
+        "SELECT setval(pg_get_serial_sequence('posts', 'id'), COALESCE(MAX(id), 0) + 1, false) FROM posts"
+    )
+
+
+def downgrade():
+    # ids allocated from the sequence stay valid:
+    pass
@@ -0,0 +1,28 @@
+"""posts timestamp id index
+
+- keyset pagination of post listings: (timestamp, id)
+- databases stamped at the baseline lack it, databases upgraded before it
+  was split off the baseline already have it
+
+Revision ID: d18da9a881e4
+Revises: 55bfb3049f08
+Create Date: 2026-10-18 12:01:58.137204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd18da9a881e4'
+down_revision = '55bfb3049f08'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE INDEX IF NOT EXISTS ix_posts_timestamp_id ON posts (timestamp, id)')
+
+
+def downgrade():
+    op.drop_index('ix_posts_timestamp_id', table_name='posts')
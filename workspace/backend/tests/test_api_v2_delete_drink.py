@@ -6,7 +6,8 @@ from flask import url_for
 
 from application import create_app, db
 from application.auth.v2.models import DelegatedUser
-from application.models import Post, PostFactory
+from application.models import Post
+from application.factories import PostFactory
 
 
 class APIV2DeletePostTestCase(unittest.TestCase):
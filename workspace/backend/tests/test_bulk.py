@@ -0,0 +1,67 @@
+import unittest
+import os
+import tempfile
+
+from sqlalchemy import text
+
+from application import create_app, db
+from application.bulk import stream_batches, update_from_values, Checkpoint
+
+
+class CheckpointTestCase(unittest.TestCase):
+    def test_checkpoint_round_trip(self):
+        """ saved key should be loaded until the checkpoint is cleared
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = Checkpoint(os.path.join(directory, 'job.checkpoint'))
+            self.assertIsNone(checkpoint.load())
+
+            checkpoint.save(42)
+            self.assertEqual(checkpoint.load(), 42)
+
+            checkpoint.clear()
+            self.assertIsNone(checkpoint.load())
+
+
+class BulkTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        # activate app context:
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+
+        self.connection = db.engine.connect()
+        self.connection.execute('CREATE TEMPORARY TABLE entries (id integer PRIMARY KEY, value text)')
+        self.connection.execute('INSERT INTO entries SELECT g, NULL FROM generate_series(1, 10) AS g')
+
+    def tearDown(self):
+        self.connection.close()
+        # deactivate app context:
+        self.app_context.pop()
+
+    def test_stream_batches(self):
+        """ rows should be streamed in batches of given size
+        """
+        batches = list(
+            stream_batches(
+                self.connection, text('SELECT id FROM entries WHERE id > :last_id ORDER BY id'), 4, 
+                last_id = 0
+            )
+        )
+
+        self.assertEqual([len(batch) for batch in batches], [4, 4, 2])
+
+    def test_update_from_values(self):
+        """ all rows should be updated in one statement
+        """
+        count = update_from_values(
+            self.connection,
+            'UPDATE entries AS e SET value = v.value FROM (VALUES %s) AS v (id, value) WHERE e.id = v.id',
+            [(id, str(id)) for id in range(1, 6)]
+        )
+
+        self.assertEqual(count, 5)
+        self.assertEqual(
+            self.connection.execute('SELECT count(*) FROM entries WHERE value = id::text').scalar(), 
+            5
+        )
@@ -0,0 +1,157 @@
+import time
+import unittest
+
+from flask import session
+
+from application import create_app, db
+from application.auth.v2.models import DelegatedUser
+from application.auth.v2.session import Session, load_current_user
+from application.models import Follow, Post
+from application.timeline import MemoryTimelineStore, timeline
+
+
+class ModelFollowTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        # activate app context:
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        # create tables:
+        db.create_all()
+
+        # add users:
+        self.follower = DelegatedUser(id = 'follower', email = 'follower@udacity.com', nickname = 'follower')
+        self.followed = DelegatedUser(id = 'followed', email = 'followed@udacity.com', nickname = 'followed')
+        db.session.add_all([self.follower, self.followed])
+        db.session.commit()
+
+    def tearDown(self):
+        # flush transaction:
+        db.session.remove()
+        # remove all tables:
+        db.drop_all()
+        # deactivate app context:
+        self.app_context.pop()
+
+    def test_follow_is_idempotent(self):
+        """ following twice should create only one follow
+        """
+        self.assertTrue(self.follower.follow(self.followed))
+        self.assertFalse(self.follower.follow(self.followed))
+        db.session.commit()
+
+        self.assertEqual(Follow.query.count(), 1)
+        self.assertTrue(self.follower.is_following(self.followed))
+        self.assertTrue(self.followed.is_followed_by(self.follower))
+
+    def test_unfollow(self):
+        """ unfollow should remove existing follow only
+        """
+        self.follower.follow(self.followed)
+        db.session.commit()
+
+        self.assertTrue(self.follower.unfollow(self.followed))
+        self.assertFalse(self.follower.unfollow(self.followed))
+        db.session.commit()
+
+        self.assertEqual(Follow.query.count(), 0)
+        self.assertFalse(self.follower.is_following(self.followed))
+
+    def test_unfollowed_posts_leave_timeline(self):
+        """ posts fanned out to a follower should be gone from the feed after unfollow
+        """
+        stores = [timeline.store, MemoryTimelineStore(max_entries=800, trim_interval=16)]
+        for store in stores:
+            timeline.store = store
+
+            self.follower.follow(self.followed)
+            post = Post(title = 'title', contents = 'contents', author_id = self.followed.id)
+            db.session.add(post)
+            db.session.flush()
+            timeline.on_post_created(post)
+            db.session.commit()
+
+            posts, _ = timeline.read(self.follower.id, None, 10)
+            self.assertIn(post.uuid.hex, [p['id'] for p in posts])
+
+            self.follower.unfollow(self.followed)
+            timeline.on_unfollow(self.follower.id, self.followed.id)
+            db.session.commit()
+
+            posts, _ = timeline.read(self.follower.id, None, 10)
+            self.assertEqual(posts, [])
+        timeline.store = stores[0]
+
+    def test_follow_checks_are_cached(self):
+        """ follow checks should be answered from cached ids until follows change or since is newer
+        """
+        self.assertFalse(self.follower.is_following(self.followed))
+        self.follower.follow(self.followed)
+        db.session.commit()
+        self.assertTrue(self.follower.is_following(self.followed))
+
+        # bypasses invalidation:
+        db.session.execute('DELETE FROM follows')
+        db.session.commit()
+        self.assertTrue(self.follower.is_following(self.followed))
+        self.assertFalse(self.follower.is_following(self.followed, since=time.time()))
+
+    def test_current_user_is_loaded_once_per_request(self):
+        """ current user should be loaded once per request
+        """
+        with self.app.test_request_context():
+            session[Session.ID] = self.follower.id
+            current_user = load_current_user()
+            self.assertEqual(current_user.id, self.follower.id)
+
+            # would hit the database again:
+            db.session.expunge(current_user)
+
+            self.assertIs(load_current_user(), current_user)
+
+        with self.app.test_request_context():
+            self.assertIsNone(load_current_user())
+
+    def test_follow_counters(self):
+        """ follow counters should track follow and unfollow, ignoring no-ops
+        """
+        self.follower.follow(self.followed)
+        self.follower.follow(self.followed)
+        db.session.commit()
+
+        self.assertEqual(self.follower.num_followed, 1)
+        self.assertEqual(self.followed.num_followers, 1)
+        self.assertEqual(self.follower.num_followers, 0)
+
+        self.follower.unfollow(self.followed)
+        self.follower.unfollow(self.followed)
+        db.session.commit()
+
+        self.assertEqual(self.follower.num_followed, 0)
+        self.assertEqual(self.followed.num_followers, 0)
+
+    def test_post_counter(self):
+        """ post counter should track post insert and delete
+        """
+        post = Post(title = 'title', contents = 'contents', author_id = self.followed.id)
+        db.session.add(post)
+        db.session.commit()
+
+        self.assertEqual(self.followed.num_posts, 1)
+
+        db.session.delete(post)
+        db.session.commit()
+
+        self.assertEqual(self.followed.num_posts, 0)
+
+    def test_recount_counters(self):
+        """ recount should repair drifted counters only
+        """
+        self.follower.follow(self.followed)
+        self.followed.num_followers = 42
+        db.session.commit()
+
+        self.assertEqual(DelegatedUser.recount_counters(), 1)
+        db.session.commit()
+
+        self.assertEqual(self.followed.num_followers, 1)
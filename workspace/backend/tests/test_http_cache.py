@@ -0,0 +1,132 @@
+import re
+import unittest
+from datetime import datetime
+
+from flask import url_for
+
+from application import create_app, db
+from application.auth.v2.models import DelegatedUser
+from application.models import Post
+
+
+class HTTPCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        # activate app context:
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        # create tables:
+        db.create_all()
+        # create client:
+        self.client = self.app.test_client(use_cookies=True)
+
+        db.session.add(DelegatedUser(id = 'user', email = 'user@udacity.com', nickname = 'user'))
+        db.session.add(Post(title = 'title', contents = 'contents', author_id = 'user'))
+        db.session.commit()
+
+    def tearDown(self):
+        # flush transaction:
+        db.session.remove()
+        # remove all tables:
+        db.drop_all()
+        # deactivate app context:
+        self.app_context.pop()
+
+    def get_posts(self, **headers):
+        return self.client.get(url_for('api_v2.posts_post_list'), headers = headers)
+
+    def test_list_has_validators(self):
+        """ post list should carry a strong ETag and the configured Cache-Control
+        """
+        response = self.get_posts()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.headers['ETag'].startswith('W/'))
+        self.assertEqual(
+            response.headers['Cache-Control'],
+            self.app.config['HTTP_CACHE_CONTROL']['api_v2.posts_post_list']
+        )
+
+    def test_current_list_is_not_modified(self):
+        """ revalidation of the current post list should be answered with an empty 304
+        """
+        etag = self.get_posts().headers['ETag']
+        response = self.get_posts(**{'If-None-Match': etag})
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers['ETag'], etag)
+        self.assertEqual(response.data, b'')
+
+    def test_new_post_modifies_list(self):
+        """ post list should be modified once a post is created
+        """
+        etag = self.get_posts().headers['ETag']
+        db.session.add(Post(title = 'newer', contents = 'contents', author_id = 'user'))
+        db.session.commit()
+
+        self.assertEqual(self.get_posts(**{'If-None-Match': etag}).status_code, 200)
+
+    def test_deleted_post_modifies_list(self):
+        """ post list should be modified once a post is deleted, though its newest post is unchanged
+        """
+        db.session.add(Post(title = 'older', contents = 'contents', author_id = 'user', timestamp = datetime(2020, 1, 1)))
+        db.session.commit()
+        etag = self.get_posts().headers['ETag']
+
+        Post.query.filter(Post.title == 'older').delete()
+        db.session.commit()
+
+        self.assertEqual(self.get_posts(**{'If-None-Match': etag}).status_code, 200)
+
+    def test_pages_have_distinct_etags(self):
+        """ each page of the post list should have its own ETag
+        """
+        etag = self.get_posts().headers['ETag']
+        response = self.client.get(
+            url_for('api_v2.posts_post_list', page = 2),
+            headers = {'If-None-Match': etag}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_renamed_author_modifies_list(self):
+        """ post list should be modified once an author listed on it is renamed
+        """
+        etag = self.get_posts().headers['ETag']
+        DelegatedUser.query.get('user').nickname = 'renamed'
+        db.session.commit()
+
+        self.assertEqual(self.get_posts(**{'If-None-Match': etag}).status_code, 200)
+
+    def test_not_modified_list_skips_posts(self):
+        """ revalidation of the current post list should not query posts
+        """
+        etag = self.get_posts().headers['ETag']
+
+        statements = []
+        def collect(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        db.event.listen(db.engine, 'before_cursor_execute', collect)
+        try:
+            response = self.get_posts(**{'If-None-Match': etag})
+        finally:
+            db.event.remove(db.engine, 'before_cursor_execute', collect)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse([statement for statement in statements if re.search(r'\bposts\b', statement)])
+
+    def test_listing_version_is_bumped_on_commit(self):
+        """ post writes should lock the listing version only while committing, not from their first flush
+        """
+        version = Post.listing_version()
+        db.session.commit()
+
+        db.session.add(Post(title = 'newer', contents = 'contents', author_id = 'user'))
+        db.session.flush()
+        # fails if the row is locked:
+        with db.engine.connect() as connection:
+            connection.execute('SELECT value FROM listing_versions FOR UPDATE NOWAIT')
+        db.session.commit()
+
+        self.assertGreater(Post.listing_version(), version)
@@ -0,0 +1,148 @@
+import base64
+import time
+import unittest
+from unittest import mock
+
+from Crypto.PublicKey import RSA
+from flask import session, url_for
+from jose import jwt
+
+from application import create_app, db
+from application.auth.v2 import services
+from application.auth.v2.jwks import JWKSCache
+from application.auth.v2.services import AuthError, provider
+from application.auth.v2.session import Session
+
+
+def b64_uint(value):
+    data = value.to_bytes((value.bit_length() + 7) // 8, 'big')
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+class IDTokenTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        key = RSA.generate(2048)
+        cls.private_key = key.exportKey().decode('ascii')
+        cls.jwks = {
+            'keys': [
+                {'kty': 'RSA', 'kid': 'key', 'use': 'sig', 'n': b64_uint(key.n), 'e': b64_uint(key.e)}
+            ]
+        }
+
+    def setUp(self):
+        self.app = create_app('testing')
+        # activate app context:
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        # create tables:
+        db.create_all()
+        # create client:
+        self.client = self.app.test_client(use_cookies=True)
+
+        # serve key set locally:
+        cache = JWKSCache('jwks', fetch=lambda url, timeout: self.jwks)
+        patcher = mock.patch.object(services, 'get_jwks_cache', return_value=cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        # flush transaction:
+        db.session.remove()
+        # remove all tables:
+        db.drop_all()
+        # deactivate app context:
+        self.app_context.pop()
+
+    def make_token(self, access_token='access', **claims):
+        now = int(time.time())
+        claims = dict({
+            'iss': provider.domain,
+            'aud': self.app.config['AUTH0_CLIENT_ID'],
+            'sub': 'auth0|user',
+            'iat': now,
+            'exp': now + 3600,
+            'nonce': 'nonce',
+            'nickname': 'user',
+            'updated_at': '2020-03-01T00:00:00.000Z'
+        }, **claims)
+        claims = {name: value for (name, value) in claims.items() if not (value is None)}
+
+        return {
+            'access_token': 'access',
+            'id_token': jwt.encode(
+                claims, self.private_key, algorithm='RS256',
+                # at_hash is only added along with the access token:
+                headers={'kid': 'key'}, access_token=access_token
+            )
+        }
+
+    def test_id_token_is_verified(self):
+        """ id token should be verified against the key set, the access token and the nonce
+        """
+        token = self.make_token()
+        claims = provider.decode_id_token(self.app.config['AUTH0_CLIENT_ID'], token, nonce='nonce')
+        self.assertEqual(claims['nickname'], 'user')
+
+        with self.assertRaises(AuthError):
+            provider.decode_id_token(self.app.config['AUTH0_CLIENT_ID'], token, nonce='replayed')
+        with self.assertRaises(AuthError):
+            provider.decode_id_token('other-client', token, nonce='nonce')
+        with self.assertRaises(AuthError):
+            provider.decode_id_token(
+                self.app.config['AUTH0_CLIENT_ID'], dict(token, access_token='other'), nonce='nonce'
+            )
+        with self.assertRaises(AuthError):
+            provider.decode_id_token(self.app.config['AUTH0_CLIENT_ID'], token, nonce=None)
+
+    def test_id_token_without_at_hash_is_verified(self):
+        """ id token without at_hash, as usual in the authorization code flow, should be accepted
+        """
+        token = self.make_token(access_token=None)
+        claims = provider.decode_id_token(self.app.config['AUTH0_CLIENT_ID'], token, nonce='nonce')
+        self.assertEqual(claims['nickname'], 'user')
+
+    def login(self, token, nonce='nonce'):
+        auth0 = self.app.config['AUTH0']
+        with self.client.session_transaction() as s:
+            if not (nonce is None):
+                s['_auth0_authlib_nonce_'] = nonce
+
+        with mock.patch.object(auth0, 'authorize_access_token', return_value=token), \
+            mock.patch.object(auth0, 'get') as get_userinfo:
+            get_userinfo.return_value.json.return_value = {'nickname': 'fetched', 'updated_at': 'now'}
+            with self.client:
+                self.client.get(url_for('auth_v2.callback'))
+                profile = session.get(Session.PROFILE)
+
+        return profile, get_userinfo
+
+    def test_callback_trusts_id_token_claims(self):
+        """ login should build the session profile from id token claims without calling userinfo
+        """
+        profile, get_userinfo = self.login(self.make_token())
+
+        self.assertEqual(profile['nickname'], 'user')
+        get_userinfo.assert_not_called()
+
+    def test_callback_fetches_missing_claims(self):
+        """ login should fall back to userinfo for claims missing in the id token
+        """
+        profile, get_userinfo = self.login(self.make_token(nickname=None))
+
+        self.assertEqual(profile['nickname'], 'fetched')
+        get_userinfo.assert_called_once_with('userinfo')
+
+    def test_callback_accepts_id_token_without_at_hash(self):
+        """ login should succeed with an id token carrying no at_hash
+        """
+        profile, _ = self.login(self.make_token(access_token=None))
+
+        self.assertEqual(profile['nickname'], 'user')
+
+    def test_callback_requires_nonce(self):
+        """ login should be rejected if this session never started the authorization request
+        """
+        profile, get_userinfo = self.login(self.make_token(), nonce=None)
+
+        self.assertIsNone(profile)
+        get_userinfo.assert_not_called()
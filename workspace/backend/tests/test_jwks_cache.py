@@ -0,0 +1,138 @@
+import unittest
+import time
+
+from application import create_app
+from application.auth.v2.jwks import JWKSCache, get_jwks_cache, jwks_caches
+
+
+class FakeJWKSEndpoint:
+    """ counts key set downloads
+    """
+    def __init__(self, kids):
+        self.kids = kids
+        self.calls = 0
+
+    def __call__(self, url, timeout):
+        self.calls += 1
+        return {
+            'keys': [
+                {'kty': 'RSA', 'kid': kid, 'use': 'sig', 'n': 'n', 'e': 'AQAB', 'x5c': []} for kid in self.kids
+            ]
+        }
+
+
+class JWKSCacheTestCase(unittest.TestCase):
+    def test_key_set_is_fetched_once(self):
+        """ known kids should be served from memory after the first download
+        """
+        endpoint = FakeJWKSEndpoint(['a', 'b'])
+        cache = JWKSCache('jwks', fetch=endpoint)
+
+        for _ in range(10):
+            self.assertEqual(cache.get_key('a')['kid'], 'a')
+            self.assertEqual(cache.get_key('b')['kid'], 'b')
+
+        self.assertEqual(endpoint.calls, 1)
+
+    def test_key_is_projected(self):
+        """ only fields needed for verification should be kept
+        """
+        cache = JWKSCache('jwks', fetch=FakeJWKSEndpoint(['a']))
+
+        self.assertEqual(
+            set(cache.get_key('a').keys()),
+            {'kty', 'kid', 'use', 'n', 'e'}
+        )
+
+    def test_unknown_kid_forces_refetch(self):
+        """ a rotated key should be picked up on first sight of its kid
+        """
+        endpoint = FakeJWKSEndpoint(['a'])
+        cache = JWKSCache('jwks', min_refresh_interval=0, fetch=endpoint)
+        cache.get_key('a')
+
+        endpoint.kids = ['a', 'b']
+
+        self.assertEqual(cache.get_key('b')['kid'], 'b')
+        self.assertEqual(endpoint.calls, 2)
+
+    def test_unknown_kid_is_negatively_cached(self):
+        """ flooding with bogus kids should not hit Auth0 again
+        """
+        endpoint = FakeJWKSEndpoint(['a'])
+        cache = JWKSCache('jwks', min_refresh_interval=0, negative_ttl=60, fetch=endpoint)
+        cache.get_key('a')
+
+        for _ in range(10):
+            self.assertIsNone(cache.get_key('bogus'))
+
+        self.assertEqual(endpoint.calls, 2)
+
+    def test_refetch_is_rate_limited(self):
+        """ distinct unknown kids should not trigger more than one refetch per interval
+        """
+        endpoint = FakeJWKSEndpoint(['a'])
+        cache = JWKSCache('jwks', min_refresh_interval=60, fetch=endpoint)
+        cache.get_key('a')
+
+        for i in range(10):
+            self.assertIsNone(cache.get_key(f'bogus-{i}'))
+
+        self.assertEqual(endpoint.calls, 1)
+
+    def test_expired_key_set_is_refetched(self):
+        """ key set should be downloaded again once ttl is reached
+        """
+        endpoint = FakeJWKSEndpoint(['a'])
+        cache = JWKSCache('jwks', ttl=0, refresh_ahead=0, fetch=endpoint)
+
+        cache.get_key('a')
+        time.sleep(0.01)
+        cache.get_key('a')
+
+        self.assertEqual(endpoint.calls, 2)
+
+    def test_stale_keys_are_served_when_auth0_is_down(self):
+        """ previous key set should be kept when refresh fails
+        """
+        endpoint = FakeJWKSEndpoint(['a'])
+        cache = JWKSCache('jwks', ttl=0, refresh_ahead=0, fetch=endpoint)
+        cache.get_key('a')
+
+        def unreachable(url, timeout):
+            raise OSError('connection refused')
+        cache.fetch = unreachable
+        time.sleep(0.01)
+
+        self.assertEqual(cache.get_key('a')['kid'], 'a')
+
+    def test_failed_refetch_is_not_retried_immediately(self):
+        """ while Auth0 is down, stale keys should be served without a fetch per request
+        """
+        endpoint = FakeJWKSEndpoint(['a'])
+        cache = JWKSCache('jwks', ttl=0, refresh_ahead=0, min_refresh_interval=60, fetch=endpoint)
+        cache.get_key('a')
+
+        calls = []
+        def unreachable(url, timeout):
+            calls.append(url)
+            raise OSError('connection refused')
+        cache.fetch = unreachable
+        time.sleep(0.01)
+
+        for _ in range(10):
+            self.assertEqual(cache.get_key('a')['kid'], 'a')
+
+        self.assertEqual(len(calls), 1)
+
+    def test_registry_takes_app_settings(self):
+        """ registered caches should be configured from the config of the running app
+        """
+        app = create_app('testing')
+        app.config['AUTH0_JWKS_TTL'] = 42
+        app.config['AUTH0_JWKS_MIN_REFRESH_INTERVAL'] = 7
+        jwks_caches.init_app(app)
+
+        cache = get_jwks_cache('https://tenant.auth0.com/')
+        self.assertEqual((cache.ttl, cache.min_refresh_interval), (42, 7))
+        self.assertIs(get_jwks_cache('https://tenant.auth0.com/'), cache)
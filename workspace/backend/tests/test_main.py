@@ -35,3 +35,23 @@ class BlueprintMainTestCase(unittest.TestCase):
         # check response code:
         self.assertEqual(response.status_code, 200)
 
+
+    def test_get_healthz(self):
+        """ liveness probe should always succeed
+        """
+        response = self.client.get(
+            url_for('main.healthz')
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['status'], 'ok')
+
+    def test_get_readyz(self):
+        """ readiness probe should succeed when database is reachable
+        """
+        response = self.client.get(
+            url_for('main.readyz')
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['status'], 'ok')
@@ -0,0 +1,149 @@
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from flask import url_for
+
+from application import create_app, db
+from application.auth.v2.models import DelegatedUser
+from application.models import Post
+from application.page_cache import FileBackend, MemoryBackend, page_cache
+
+
+class PageCacheBackendTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_add_is_set_if_absent(self):
+        """ add should only set keys that are absent or expired
+        """
+        for backend in (MemoryBackend(), FileBackend(self.directory)):
+            self.assertTrue(backend.add('lock', '1', 10))
+            self.assertFalse(backend.add('lock', '2', 10))
+            self.assertEqual(backend.get('lock'), '1')
+
+            backend.set('expired', '1', -1)
+            self.assertIsNone(backend.get('expired'))
+            self.assertTrue(backend.add('expired', '2', 10))
+
+            backend.delete('lock')
+            self.assertTrue(backend.add('lock', '3', 10))
+
+    def test_counters(self):
+        """ counters should start at zero and be shared by backends on the same directory
+        """
+        backend = FileBackend(self.directory)
+        self.assertEqual(backend.get_counter('generation'), 0)
+        self.assertEqual(backend.incr('generation'), 1)
+
+        self.assertEqual(FileBackend(self.directory).get_counter('generation'), 1)
+
+    def test_counter_reads_never_go_back(self):
+        """ concurrent reads should never see a counter older than a previous read
+        """
+        backend = FileBackend(self.directory)
+
+        def increment():
+            for _ in range(500):
+                backend.incr('generation')
+        writer = threading.Thread(target=increment)
+        writer.start()
+
+        values = [backend.get_counter('generation') for _ in range(1000)]
+        writer.join()
+
+        self.assertEqual(values, sorted(values))
+        self.assertEqual(backend.get_counter('generation'), 500)
+
+    def test_add_counts_one_lookup(self):
+        """ add should count one lookup in the memory backend stats
+        """
+        backend = MemoryBackend()
+        backend.add('lock', '1', 10)
+        backend.add('lock', '2', 10)
+
+        stats = backend._entries.stats
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+class PageCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        # activate app context:
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        # create tables:
+        db.create_all()
+        # create client:
+        self.client = self.app.test_client(use_cookies=True)
+
+        db.session.add(DelegatedUser(id = 'user', email = 'user@udacity.com', nickname = 'user'))
+        db.session.add(Post(title = 'first', contents = 'contents', author_id = 'user'))
+        db.session.commit()
+
+    def tearDown(self):
+        # flush transaction:
+        db.session.remove()
+        # remove all tables:
+        db.drop_all()
+        # deactivate app context:
+        self.app_context.pop()
+
+    def test_concurrent_misses_render_once(self):
+        """ concurrent misses of one page should render it once
+        """
+        renders = []
+        def render():
+            renders.append(1)
+            time.sleep(0.2)
+            return 'html'
+
+        pages = []
+        threads = [
+            threading.Thread(target=lambda: pages.append(page_cache.get_or_render('page', (1, ), render)))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(renders), 1)
+        self.assertEqual(pages, ['html'] * 4)
+
+    def test_post_writes_bump_generation(self):
+        """ committed post writes should bump the generation, rolled back ones should not
+        """
+        generation = page_cache.generation()
+
+        post = Post.query.first()
+        post.title = 'edited'
+        db.session.commit()
+        self.assertEqual(page_cache.generation(), generation + 1)
+
+        db.session.add(Post(title = 'second', contents = 'contents', author_id = 'user'))
+        db.session.flush()
+        db.session.rollback()
+        self.assertEqual(page_cache.generation(), generation + 1)
+
+    def test_anonymous_posts_are_cached(self):
+        """ posts page should be served from cache to anonymous visitors until posts are written
+        """
+        self.assertIn(b'first', self.client.get(url_for('posts.posts')).data)
+
+        # bypasses invalidation:
+        db.session.execute(
+            "UPDATE posts SET title = 'hidden' WHERE title = 'first'"
+        )
+        db.session.commit()
+        self.assertIn(b'first', self.client.get(url_for('posts.posts')).data)
+
+        db.session.add(Post(title = 'second', contents = 'contents', author_id = 'user'))
+        db.session.commit()
+        data = self.client.get(url_for('posts.posts')).data
+        self.assertIn(b'hidden', data)
+        self.assertIn(b'second', data)
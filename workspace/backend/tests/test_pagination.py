@@ -0,0 +1,83 @@
+import unittest
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, Column, Integer, DateTime
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+
+from application.pagination import encode_cursor, decode_cursor, KeysetPagination
+
+Base = declarative_base()
+
+class Entry(Base):
+    __tablename__ = 'entries'
+
+    id = Column(Integer, primary_key=True)
+    timestamp = Column(DateTime)
+
+
+class CursorTestCase(unittest.TestCase):
+    def test_cursor_round_trip(self):
+        """ decoded cursor should be the encoded (timestamp, id)
+        """
+        timestamp = datetime(2020, 3, 8, 12, 30, 45, 123456)
+        cursor = encode_cursor(timestamp, 42)
+
+        self.assertEqual(decode_cursor(cursor), (timestamp, 42))
+
+    def test_cursor_is_url_safe(self):
+        """ cursor should be usable as query parameter without escaping
+        """
+        cursor = encode_cursor(datetime(2020, 3, 8), 42)
+
+        self.assertRegex(cursor, r'^[A-Za-z0-9_-]+$')
+
+    def test_malformed_cursor(self):
+        """ malformed cursor should raise ValueError
+        """
+        with self.assertRaises(ValueError):
+            decode_cursor('not a cursor')
+
+
+class KeysetPaginationTestCase(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine('sqlite://')
+        Base.metadata.create_all(engine)
+        self.session = sessionmaker(bind=engine)()
+
+        # two entries share each timestamp, so id has to break ties:
+        start = datetime(2020, 1, 1)
+        self.session.add_all(
+            [
+                Entry(id=id, timestamp=start + timedelta(minutes=id // 2)) for id in range(1, 12)
+            ]
+        )
+        self.session.commit()
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_pages_cover_all_rows_once(self):
+        """ following next cursors should visit every row exactly once, newest first
+        """
+        query = self.session.query(Entry.id, Entry.timestamp)
+
+        visited = []
+        after = ''
+        while True:
+            pagination = KeysetPagination(query, Entry.timestamp, Entry.id, after, per_page=3)
+            visited.extend(row.id for row in pagination.items)
+            if not pagination.has_next:
+                break
+            after = pagination.next_cursor
+
+        self.assertEqual(visited, list(range(11, 0, -1)))
+
+    def test_last_page_has_no_cursor(self):
+        """ next cursor should be absent when there are no more rows
+        """
+        query = self.session.query(Entry.id, Entry.timestamp)
+        pagination = KeysetPagination(query, Entry.timestamp, Entry.id, '', per_page=11)
+
+        self.assertFalse(pagination.has_next)
+        self.assertIsNone(pagination.next_cursor)
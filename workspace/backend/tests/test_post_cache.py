@@ -0,0 +1,131 @@
+import time
+import unittest
+
+from flask import url_for
+
+from application import create_app, db
+from application.auth.v2.models import DelegatedUser
+from application.cache import LRUCache
+from application.models import Post
+from application.page_cache import page_cache
+from application.post_cache import post_cache
+
+
+class PostCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        # activate app context:
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        # create tables:
+        db.create_all()
+
+        db.session.add(DelegatedUser(id = 'user', email = 'user@udacity.com', nickname = 'user'))
+        db.session.add(Post(title = 'title', contents = '**contents**', author_id = 'user'))
+        db.session.commit()
+        self.post_uuid = Post.query.first().uuid.hex
+
+    def tearDown(self):
+        # flush transaction:
+        db.session.remove()
+        # remove all tables:
+        db.drop_all()
+        # deactivate app context:
+        self.app_context.pop()
+
+    def test_weighted_capacity(self):
+        """ weighted cache should evict by total weight and skip values heavier than capacity
+        """
+        cache = LRUCache(10, weigh=len)
+        cache.set('a', 'x' * 4)
+        cache.set('b', 'x' * 4)
+        cache.set('c', 'x' * 4)
+
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.weight, 8)
+
+        cache.set('huge', 'x' * 11)
+        self.assertIsNone(cache.get('huge'))
+        self.assertEqual(cache.weight, 8)
+
+    def test_read_through(self):
+        """ post should be loaded once with its rendered contents, then served from cache
+        """
+        post = post_cache.get(self.post_uuid)
+        self.assertEqual(post['author'], 'user')
+        self.assertIn('<strong>contents</strong>', post['contents_html'])
+
+        # bypasses invalidation:
+        db.session.execute("UPDATE posts SET title = 'hidden'")
+        db.session.commit()
+        self.assertEqual(post_cache.get(self.post_uuid)['title'], 'title')
+
+    def test_writes_invalidate(self):
+        """ committed edits, deletes and nickname changes should drop cached posts
+        """
+        post_cache.get(self.post_uuid)
+        post = Post.query.first()
+        post.title = 'edited'
+        db.session.commit()
+        self.assertEqual(post_cache.get(self.post_uuid)['title'], 'edited')
+
+        user = DelegatedUser.query.get('user')
+        user.nickname = 'renamed'
+        db.session.commit()
+        self.assertEqual(post_cache.get(self.post_uuid)['author'], 'renamed')
+
+        db.session.delete(Post.query.first())
+        db.session.commit()
+        self.assertIsNone(post_cache.get(self.post_uuid))
+
+    def test_writes_of_other_workers_are_seen(self):
+        """ cached posts should be dropped once another worker bumps the shared generation
+        """
+        post_cache.get(self.post_uuid)
+
+        # bypass invalidation, like commits of other workers:
+        db.session.execute("UPDATE posts SET title = 'edited'")
+        db.session.commit()
+        self.assertEqual(post_cache.get(self.post_uuid)['title'], 'title')
+        page_cache.bump()
+        self.assertEqual(post_cache.get(self.post_uuid)['title'], 'edited')
+
+        db.session.execute("DELETE FROM posts")
+        db.session.commit()
+        page_cache.bump()
+        self.assertIsNone(post_cache.cached(self.post_uuid))
+        self.assertIsNone(post_cache.version(self.post_uuid))
+        self.assertIsNone(post_cache.get(self.post_uuid))
+
+    def test_hits_skip_database(self):
+        """ cached posts should be served without querying the database
+        """
+        post_cache.get(self.post_uuid)
+
+        statements = []
+        def collect(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        db.event.listen(db.engine, 'before_cursor_execute', collect)
+        try:
+            self.assertEqual(post_cache.cached(self.post_uuid)['title'], 'title')
+            self.assertEqual(post_cache.get(self.post_uuid)['title'], 'title')
+        finally:
+            db.event.remove(db.engine, 'before_cursor_execute', collect)
+
+        self.assertEqual(statements, [])
+
+    def test_entries_expire_without_shared_generation(self):
+        """ without a page cache, cached posts should be served for up to ttl
+        """
+        backend, ttl = page_cache.backend, post_cache.ttl
+        page_cache.backend, post_cache.ttl = None, 0.05
+        try:
+            post_cache.get(self.post_uuid)
+            db.session.execute("UPDATE posts SET title = 'edited'")
+            db.session.commit()
+            self.assertEqual(post_cache.get(self.post_uuid)['title'], 'title')
+
+            time.sleep(0.1)
+            self.assertEqual(post_cache.get(self.post_uuid)['title'], 'edited')
+        finally:
+            page_cache.backend, post_cache.ttl = backend, ttl
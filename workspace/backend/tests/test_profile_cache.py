@@ -0,0 +1,180 @@
+import unittest
+from datetime import datetime, timedelta
+
+from application import create_app, db
+from application.auth.v2.models import DelegatedUser
+from application.models import SyncWatermark
+from application.users.profiles import ProfileCache, parse_timestamp
+
+
+class UserByEmailStub:
+    """ users-by-email service counting its calls
+    """
+    def __init__(self):
+        self.calls = 0
+
+    def get(self, email):
+        self.calls += 1
+
+        return [
+            {
+                'user_id': 'auth0|user',
+                'email': email,
+                'nickname': f'nickname-{self.calls}',
+                'user_metadata': {
+                    'location': 'Shanghai',
+                    'about_me': 'Full stacker'
+                },
+                'updated_at': '2020-03-08T12:30:45.123Z',
+                'last_login': '2020-03-09T08:00:00.000Z'
+            }
+        ]
+
+
+class UsersStub:
+    """ users listing service, searching by updated_at and serving at most limit users
+    """
+    def __init__(self, users, limit=1000):
+        self.users = users
+        self.limit = limit
+        self.queries = []
+
+    def get_all(self, params):
+        self.queries.append(params.get('q'))
+
+        users = sorted(self.users, key=lambda user: user['updated_at'])
+        if 'q' in params:
+            since = params['q'].split('"')[1]
+            users = [user for user in users if user['updated_at'] >= since]
+
+        return users[:self.limit], len(users)
+
+
+def userinfo(id, updated_at):
+    return {
+        'user_id': f'auth0|{id}',
+        'email': f'{id}@udacity.com',
+        'nickname': id,
+        'updated_at': updated_at
+    }
+
+
+class ProfileCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        # activate app context:
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        # create tables:
+        db.create_all()
+
+        self.user = DelegatedUser(id = 'user', email = 'user@udacity.com', nickname = 'user')
+        db.session.add(self.user)
+        db.session.commit()
+
+        self.service = UserByEmailStub()
+        self.profiles = ProfileCache(self.service)
+        self.profiles.init_app(self.app)
+
+    def tearDown(self):
+        # wait for background refreshes:
+        self.profiles._executor.shutdown(wait=True)
+        # flush transaction:
+        db.session.remove()
+        # remove all tables:
+        db.drop_all()
+        # deactivate app context:
+        self.app_context.pop()
+
+    def test_cold_profile_is_fetched(self):
+        """ profile never synced should be fetched from backend
+        """
+        self.profiles.load(self.user)
+
+        self.assertEqual(self.service.calls, 1)
+        self.assertEqual(self.user.nickname, 'nickname-1')
+        self.assertEqual(self.user.location, 'Shanghai')
+        self.assertEqual(self.user.last_login, datetime(2020, 3, 9, 8))
+
+    def test_warm_profile_is_served_locally(self):
+        """ fresh profile should be served without calling backend
+        """
+        self.profiles.load(self.user)
+        self.profiles.load(self.user)
+
+        self.assertEqual(self.service.calls, 1)
+
+    def test_stale_profile_is_refreshed_in_background(self):
+        """ stale profile should be served as it is and refreshed once in the background
+        """
+        self.profiles.load(self.user)
+        self.user.profile_synced_at = datetime.utcnow() - self.profiles.ttl - timedelta(seconds=1)
+        db.session.commit()
+
+        self.profiles.load(self.user)
+        self.assertEqual(self.user.nickname, 'nickname-1')
+
+        self.profiles._executor.shutdown(wait=True)
+        db.session.expire_all()
+
+        self.assertEqual(self.service.calls, 2)
+        self.assertEqual(self.user.nickname, 'nickname-2')
+
+    def test_users_are_upserted_in_bulk(self):
+        """ existing users should be updated and new users inserted, counters kept
+        """
+        self.user.num_posts = 3
+        db.session.commit()
+
+        userinfos = self.service.get('user@udacity.com') + [
+            {'user_id': 'auth0|new', 'email': 'new@udacity.com', 'nickname': 'new'}
+        ]
+        count = ProfileCache.store_many(userinfos, batch_size = 1)
+        db.session.commit()
+        db.session.expire_all()
+
+        self.assertEqual(count, 2)
+        self.assertEqual(self.user.nickname, 'nickname-1')
+        self.assertEqual(self.user.location, 'Shanghai')
+        self.assertEqual(self.user.num_posts, 3)
+        self.assertIsNotNone(self.user.profile_synced_at)
+        self.assertEqual(DelegatedUser.query.get('new').email, 'new@udacity.com')
+
+    def test_first_sync_lists_all_users(self):
+        """ first sync should list all users and record the newest change as watermark
+        """
+        service = UsersStub(
+            [userinfo('a', '2020-03-08T12:00:00.000Z'), userinfo('b', '2020-03-08T13:00:00.000Z')]
+        )
+        fetched, upserted = ProfileCache.sync(service)
+
+        self.assertEqual((fetched, upserted), (2, 2))
+        self.assertEqual(service.queries, [None])
+        self.assertEqual(SyncWatermark.get(ProfileCache.SYNC_WATERMARK), parse_timestamp('2020-03-08T13:00:00.000Z'))
+
+    def test_later_sync_upserts_changes_only(self):
+        """ later syncs should search changes since watermark minus overlap and skip unchanged users
+        """
+        users = [userinfo('a', '2020-03-08T12:00:00.000Z'), userinfo('b', '2020-03-08T13:00:00.000Z')]
+        service = UsersStub(users)
+        ProfileCache.sync(service)
+
+        users.append(userinfo('c', '2020-03-08T13:02:00.000Z'))
+        fetched, upserted = ProfileCache.sync(service, overlap = timedelta(minutes=5))
+
+        self.assertEqual(service.queries[-1], 'updated_at:["2020-03-08T12:55:00.000Z" TO *]')
+        self.assertEqual((fetched, upserted), (2, 1))
+        self.assertEqual(SyncWatermark.get(ProfileCache.SYNC_WATERMARK), parse_timestamp('2020-03-08T13:02:00.000Z'))
+
+    def test_capped_listing_is_continued(self):
+        """ sync should continue after the newest change when a listing is capped
+        """
+        service = UsersStub(
+            [userinfo(f'user{i}', f'2020-03-08T12:0{i}:00.000Z') for i in range(5)], 
+            limit = 2
+        )
+        fetched, upserted = ProfileCache.sync(service)
+
+        self.assertEqual(upserted, 5)
+        self.assertEqual(DelegatedUser.query.count(), 6)
+        self.assertEqual(SyncWatermark.get(ProfileCache.SYNC_WATERMARK), parse_timestamp('2020-03-08T12:04:00.000Z'))
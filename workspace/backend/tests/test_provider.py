@@ -0,0 +1,214 @@
+import unittest
+import asyncio
+import json
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import aiohttp
+import requests
+
+from application.auth.v2.services import Provider, AsyncProvider
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """ replies with the next scripted (status, delay) of the server
+    """
+    def _reply(self):
+        self.server.requests.append(self.command)
+        status, delay = self.server.script.pop(0) if self.server.script else (200, 0)
+        time.sleep(delay)
+
+        body = json.dumps({'status': status}).encode('utf-8')
+        self.send_response(status)
+        if status == 429:
+            self.send_header('Retry-After', '0')
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = do_PATCH = do_DELETE = _reply
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # clients hang up on timed out calls:
+        pass
+
+
+class ProviderTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = StubServer(('127.0.0.1', 0), StubHandler)
+        self.server.script = []
+        self.server.requests = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        self.url = 'http://127.0.0.1:{}/api/v2/users'.format(self.server.server_address[1])
+        self.provider = Provider(
+            domain = 'http://127.0.0.1/', 
+            token = 'token', 
+            algorithms = ['RS256'],
+            timeout = (1, 0.5),
+            retries = 2,
+            backoff_factor = 0
+        )
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_get_is_retried_on_server_errors(self):
+        """ GET should be retried on 429 and 5xx until it succeeds
+        """
+        self.server.script = [(503, 0), (429, 0)]
+        response = self.provider.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.server.requests, ['GET'] * 3)
+
+    def test_post_is_not_retried(self):
+        """ POST should not be retried as it is not idempotent
+        """
+        self.server.script = [(503, 0)]
+        response = self.provider.post(self.url, {'email': 'user@udacity.com'})
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.server.requests, ['POST'])
+
+    def test_exhausted_retries_return_last_response(self):
+        """ last response should be returned once retries are exhausted
+        """
+        self.server.script = [(503, 0)] * 3
+        response = self.provider.get(self.url)
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_slow_response_times_out(self):
+        """ call should fail once read timeout elapses
+        """
+        self.server.script = [(200, 1)] * 3
+        with self.assertRaises(requests.exceptions.RequestException):
+            self.provider.get(self.url)
+
+    def test_latency_metrics(self):
+        """ calls, errors and latencies should be recorded per method
+        """
+        self.server.script = [(200, 0), (404, 0)]
+        self.provider.get(self.url)
+        self.provider.get(self.url)
+
+        stats = self.provider.stats['GET']
+        self.assertEqual(stats['calls'], 2)
+        self.assertEqual(stats['errors'], 1)
+        self.assertGreater(stats['max_latency'], 0)
+        self.assertGreaterEqual(stats['max_latency'], stats['avg_latency'])
+
+
+class PagedHandler(BaseHTTPRequestHandler):
+    """ serves server users page by page, after the scripted (status, headers) replies
+    """
+    def do_GET(self):
+        query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+        self.server.requests.append(query)
+        if self.server.script:
+            status, headers = self.server.script.pop(0)
+        else:
+            status, headers = 200, {}
+
+        if status == 200:
+            page, per_page = int(query['page'][0]), int(query['per_page'][0])
+            body = {
+                'users': self.server.users[page * per_page:(page + 1) * per_page],
+                'total': len(self.server.users)
+            }
+        else:
+            body = {'status': status}
+
+        body = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        for (name, value) in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class AsyncProviderTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = StubServer(('127.0.0.1', 0), PagedHandler)
+        self.server.script = []
+        self.server.requests = []
+        self.server.users = [{'user_id': f'auth0|{i}'} for i in range(25)]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        self.url = 'http://127.0.0.1:{}/api/v2/users'.format(self.server.server_address[1])
+        self.provider = AsyncProvider(
+            domain = 'http://127.0.0.1/', 
+            token = 'token', 
+            concurrency = 3,
+            timeout = (1, 0.5),
+            retries = 2,
+            backoff_factor = 0
+        )
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def get_pages(self, per_page=10):
+        return asyncio.run(self.provider.get_pages(self.url, 'users', {}, per_page))
+
+    def test_all_pages_are_fetched(self):
+        """ items of all pages should be returned in order
+        """
+        users, total = self.get_pages()
+
+        self.assertEqual(total, 25)
+        self.assertEqual(users, self.server.users)
+        self.assertEqual(sorted(int(query['page'][0]) for query in self.server.requests), [0, 1, 2])
+
+    def test_listing_is_capped(self):
+        """ pages beyond what Auth0 serves should not be requested
+        """
+        self.server.users = [{'user_id': f'auth0|{i}'} for i in range(1200)]
+        users, total = self.get_pages(per_page=100)
+
+        self.assertEqual(total, 1200)
+        self.assertEqual(len(users), AsyncProvider.MAX_PAGED_RESULTS)
+
+    def test_rate_limited_call_is_retried(self):
+        """ 429 should be retried once Retry-After elapses
+        """
+        self.server.script = [(429, {'Retry-After': '0.2'})]
+        start = time.monotonic()
+        users, _ = self.get_pages()
+
+        self.assertEqual(users, self.server.users)
+        self.assertEqual(len(self.server.requests), 4)
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+
+    def test_exhausted_window_pauses_calls(self):
+        """ calls should wait for X-RateLimit-Reset once remaining calls are exhausted
+        """
+        reset = time.time() + 0.3
+        self.server.script = [(200, {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(reset)})]
+        self.get_pages()
+
+        self.assertGreaterEqual(time.time(), reset)
+
+    def test_exhausted_retries_raise(self):
+        """ server errors should raise once retries are exhausted
+        """
+        self.server.script = [(503, {})] * 3
+        with self.assertRaises(aiohttp.ClientResponseError):
+            self.get_pages()
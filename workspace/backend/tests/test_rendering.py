@@ -0,0 +1,122 @@
+import unittest
+import tempfile
+
+from application import create_app, db
+from application.auth.v2.models import DelegatedUser
+from application.models import Post
+from application.rendering import renderer, render, RENDER_VERSION, RenderCache
+
+
+class RenderTestCase(unittest.TestCase):
+    def test_markdown_is_rendered(self):
+        """ markdown should be rendered into html
+        """
+        self.assertEqual(render('**goose**'), '<p><strong>goose</strong></p>')
+
+    def test_html_is_sanitized(self):
+        """ tags out of whitelist should be stripped
+        """
+        self.assertNotIn('<script>', render('<script>alert(1)</script>'))
+
+
+class RenderCacheTestCase(unittest.TestCase):
+    def test_same_contents_are_rendered_once(self):
+        """ duplicated contents should be served from memory tier
+        """
+        cache = RenderCache(capacity = 2)
+
+        self.assertEqual(cache.render('**goose**'), render('**goose**'))
+        self.assertEqual(cache.render('**goose**'), render('**goose**'))
+        self.assertEqual(cache.stats['renders'], 1)
+        self.assertEqual(cache.stats['memory_hits'], 1)
+        self.assertEqual(cache.stats['hit_rate'], 0.5)
+
+    def test_file_tier_is_shared(self):
+        """ contents rendered by one cache should be served to another from file tier
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            RenderCache(directory = directory).render('**goose**')
+
+            cache = RenderCache(directory = directory)
+
+            self.assertEqual(cache.render('**goose**'), render('**goose**'))
+            self.assertEqual(cache.stats['renders'], 0)
+            self.assertEqual(cache.stats['file_hits'], 1)
+
+
+class RendererTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        # activate app context:
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        # create tables:
+        db.create_all()
+
+        db.session.add(DelegatedUser(id = 'author', email = 'author@udacity.com', nickname = 'author'))
+        db.session.commit()
+
+    def tearDown(self):
+        renderer.mode = 'sync'
+        # flush transaction:
+        db.session.remove()
+        # remove all tables:
+        db.drop_all()
+        # deactivate app context:
+        self.app_context.pop()
+
+    def _wait_for_renders(self):
+        renderer._executor.shutdown(wait=True)
+        db.session.expire_all()
+
+    def test_sync_render(self):
+        """ html should be rendered on contents set in sync mode
+        """
+        post = Post(title = 'title', contents = '*goose*', author_id = 'author')
+
+        self.assertEqual(post.contents_html, '<p><em>goose</em></p>')
+        self.assertEqual(post.render_version, RENDER_VERSION)
+
+    def test_unchanged_contents_are_not_rendered(self):
+        """ assigning the same contents should keep the html as it is
+        """
+        post = Post(title = 'title', contents = '*goose*', author_id = 'author')
+        db.session.add(post)
+        db.session.commit()
+        renders = renderer.cache.stats['renders']
+
+        post.title = 'retitled'
+        post.contents = '*goose*'
+        db.session.commit()
+
+        self.assertEqual(renderer.cache.stats['renders'], renders)
+        self.assertEqual(renderer.cache.stats['memory_hits'], 0)
+
+    def test_deferred_render(self):
+        """ html should be rendered in the background once the post is committed
+        """
+        renderer.mode = 'deferred'
+        post = Post(title = 'title', contents = '*goose*', author_id = 'author')
+        db.session.add(post)
+        db.session.commit()
+
+        self.assertEqual(
+            renderer.html(post.contents, None), 
+            '<p><em>goose</em></p>'
+        )
+
+        self._wait_for_renders()
+
+        self.assertEqual(post.contents_html, '<p><em>goose</em></p>')
+        self.assertEqual(post.render_version, RENDER_VERSION)
+        self.assertFalse(post.rendered_at is None)
+
+    def test_rolled_back_post_is_not_rendered(self):
+        """ render should not be scheduled for rolled back changes
+        """
+        renderer.mode = 'deferred'
+        db.session.add(Post(title = 'title', contents = '*goose*', author_id = 'author'))
+        db.session.flush()
+        db.session.rollback()
+
+        self.assertFalse('pending_renders' in db.session.info)
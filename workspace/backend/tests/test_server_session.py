@@ -0,0 +1,109 @@
+import unittest
+from datetime import datetime, timedelta
+
+from flask import session
+
+from application import create_app, db
+from application.models import StoredSession
+from application.server_session import hash_sid, server_sessions
+
+
+class ServerSessionTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        # activate app context:
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        # create tables:
+        db.create_all()
+        # create client:
+        self.client = self.app.test_client(use_cookies=True)
+
+        @self.app.route('/session/set/<value>')
+        def set_value(value):
+            session['value'] = value
+            return ''
+
+        @self.app.route('/session/get')
+        def get_value():
+            return session.get('value', '')
+
+        @self.app.route('/session/login')
+        def login():
+            session.regenerate()
+            return ''
+
+        @self.app.route('/session/untouched')
+        def untouched():
+            return ''
+
+        # count store loads:
+        self.loads = []
+        load = server_sessions.store.load
+        def counted_load(key):
+            self.loads.append(key)
+            return load(key)
+        server_sessions.store.load = counted_load
+
+    def tearDown(self):
+        # flush transaction:
+        db.session.remove()
+        # remove all tables:
+        db.drop_all()
+        # deactivate app context:
+        self.app_context.pop()
+
+    def get_sid(self):
+        for cookie in self.client.cookie_jar:
+            if cookie.name == self.app.session_cookie_name:
+                return cookie.value
+
+    def test_cookie_carries_only_id(self):
+        """ session data should be stored server-side under the hashed id kept in the cookie
+        """
+        self.client.get('/session/set/secret')
+        sid = self.get_sid()
+
+        self.assertNotIn('secret', sid)
+        self.assertIsNotNone(StoredSession.query.get(hash_sid(sid)))
+        self.assertEqual(self.client.get('/session/get').data, b'secret')
+
+    def test_session_is_loaded_lazily_and_saved_when_modified(self):
+        """ sessions should only be loaded when touched and only written back when modified
+        """
+        self.client.get('/session/set/secret')
+        expires_at = StoredSession.query.get(hash_sid(self.get_sid())).expires_at
+        db.session.rollback()
+
+        self.client.get('/session/untouched')
+        self.assertEqual(self.loads, [])
+
+        response = self.client.get('/session/get')
+        self.assertEqual(len(self.loads), 1)
+        self.assertNotIn('Set-Cookie', response.headers)
+        self.assertEqual(StoredSession.query.get(hash_sid(self.get_sid())).expires_at, expires_at)
+
+    def test_ids_are_issued_by_server(self):
+        """ unknown ids should never be adopted and login should issue a new id
+        """
+        self.client.set_cookie('localhost.localdomain', self.app.session_cookie_name, 'forged')
+        self.client.get('/session/set/secret')
+        sid = self.get_sid()
+        self.assertNotEqual(sid, 'forged')
+        self.client.delete_cookie('localhost.localdomain', self.app.session_cookie_name)
+
+        self.client.get('/session/login')
+        self.assertNotEqual(self.get_sid(), sid)
+        self.assertIsNone(StoredSession.query.get(hash_sid(sid)))
+        self.assertEqual(self.client.get('/session/get').data, b'secret')
+
+    def test_sweep_deletes_expired_sessions_in_batches(self):
+        """ sweep should delete all expired sessions, batch by batch, and keep active ones
+        """
+        now = datetime.utcnow()
+        for i in range(5):
+            server_sessions.store.save(f'expired-{i}', '{}', now - timedelta(seconds=1))
+        server_sessions.store.save('active', '{}', now + timedelta(hours=1))
+
+        self.assertEqual(server_sessions.sweep(batch_size=2), 5)
+        self.assertEqual([s.id for s in StoredSession.query.all()], ['active'])
@@ -0,0 +1,32 @@
+import unittest
+
+from application import create_app
+from application.rendering import renderer
+from application.serving import resident_memory, after_fork
+from application.users import profiles
+
+
+class ResidentMemoryTestCase(unittest.TestCase):
+    def test_memory_grows_with_allocations(self):
+        """ resident memory should grow once a large buffer is allocated
+        """
+        before = resident_memory()
+        buffer = bytearray(64 * 1024 * 1024)
+
+        self.assertGreater(resident_memory(), before + 32)
+        del buffer
+
+
+class AfterForkTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+
+    def test_executors_are_recreated(self):
+        """ background executors inherited from the master should be replaced
+        """
+        inherited = (renderer._executor, profiles._executor)
+
+        after_fork(self.app)
+
+        self.assertIsNot(renderer._executor, inherited[0])
+        self.assertIsNot(profiles._executor, inherited[1])
@@ -0,0 +1,72 @@
+import unittest
+import time
+
+from application.cache import LRUCache
+from application.api.v2.auth.tokens import VerifiedTokenCache
+
+
+class LRUCacheTestCase(unittest.TestCase):
+    def test_least_recently_used_is_evicted(self):
+        """ cache should keep at most capacity entries, dropping the least recently used first
+        """
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        # touch a:
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_expired_entry_is_dropped(self):
+        """ entry should not be served after its expiry
+        """
+        cache = LRUCache(2)
+        cache.set('a', 1, expires_at=time.time() - 1)
+
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(len(cache), 0)
+
+    def test_stats(self):
+        """ hits and misses should be counted
+        """
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        cache.get('a')
+        cache.get('b')
+
+        self.assertEqual(cache.stats['hits'], 1)
+        self.assertEqual(cache.stats['misses'], 1)
+        self.assertEqual(cache.stats['hit_rate'], 0.5)
+
+
+class VerifiedTokenCacheTestCase(unittest.TestCase):
+    def test_verified_payload_is_reused(self):
+        """ payload of a verified token should be served until the token expires
+        """
+        cache = VerifiedTokenCache()
+        payload = {'sub': 'auth0|user', 'exp': time.time() + 60}
+        cache.set('token', payload)
+
+        self.assertEqual(cache.get('token'), payload)
+        self.assertIsNone(cache.get('another token'))
+        self.assertEqual(cache.stats['hits'], 1)
+        self.assertEqual(cache.stats['misses'], 1)
+
+    def test_expired_token_is_verified_again(self):
+        """ payload of an expired token should not be served
+        """
+        cache = VerifiedTokenCache()
+        cache.set('token', {'sub': 'auth0|user', 'exp': time.time() - 1})
+
+        self.assertIsNone(cache.get('token'))
+
+    def test_token_without_expiry_is_not_cached(self):
+        """ payload without exp claim should always be verified
+        """
+        cache = VerifiedTokenCache()
+        cache.set('token', {'sub': 'auth0|user'})
+
+        self.assertIsNone(cache.get('token'))